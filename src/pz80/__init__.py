@@ -1,6 +1,36 @@
+from typing import TYPE_CHECKING
+
 from .__about__ import __version__
-from .asm import Asm, assemble
-from .disasm import Disasm, disassemble
-from .z80 import Z80
 
-__all__ = ["Asm", "Disasm", "Z80", "assemble", "disassemble", "__version__"]
\ No newline at end of file
+if TYPE_CHECKING:
+    # 型チェッカー向け (実行時は __getattr__ で遅延読み込みする)
+    from .asm import Asm, assemble
+    from .disasm import Disasm, disassemble
+    from .z80 import Z80
+
+__all__ = ["Asm", "Disasm", "Z80", "assemble", "disassemble", "__version__"]
+
+# サブモジュールは初回アクセス時に読み込む (CLI起動時に不要なモジュールを読み込まないため)
+_lazy_attrs = {
+    "Asm": "asm",
+    "assemble": "asm",
+    "Disasm": "disasm",
+    "disassemble": "disasm",
+    "Z80": "z80",
+}
+
+
+def __getattr__(name):
+    module = _lazy_attrs.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
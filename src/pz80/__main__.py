@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 
 import argparse
-import importlib
-import importlib.util
+import contextlib
+import functools
 import os
 import sys
 
-from pz80 import __about__, asm, disasm
+from pz80 import __about__
 
 # version
 
@@ -17,6 +17,8 @@ def command_asm(args):
     Args:
         args (argparse.Namespace): コマンドライン引数。
     """
+    # 起動時間短縮のため、サブコマンドで使用するモジュールのみ遅延インポートする
+    from pz80 import asm
 
     ope = asm.Asm()
     try:
@@ -25,70 +27,166 @@ def command_asm(args):
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
-    mode = "wb"
+    size = 0
     if args.size is not None:
         try:
             size = int(args.size, 0)
             if size < 0:
                 print(f"Error: Output size cannot be negative: {args.size}", file=sys.stderr)
                 sys.exit(1)
-
-            with open(args.output, "wb") as f:
-                f.write(b"\x00" * size)
-            mode = "rb+"
         except ValueError:
             print(f"Error: Invalid size format: {args.size}", file=sys.stderr)
             sys.exit(1)
 
+    # 出力イメージをメモリ上で構築 (書き込みは1回のみ)
+    # イメージは最終アドレスまでとし、指定サイズまでの0埋めは書き込み時に行う
+    emit = [(max(0, p.get("base", 0)) + p.get("offset", 0), p["opcode"]) for p in inp if p.get("opcode")]
+    end = max((address + len(op) for address, op in emit), default=0)
+
+    buf = bytearray(end)
+    for address, op in emit:
+        buf[address : address + len(op)] = bytes(op)
+
     # write object
     try:
-        with open(args.output, mode) as f:
-            for p in inp:
-                if not p.get("opcode"):
-                    continue
+        with open(args.output, "wb") as f:
+            f.write(buf)
+            # 指定サイズまでの0埋めはファイル拡張で行い、パディングをメモリ上に作らない
+            if size > end:
+                f.truncate(size)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
-                base = p.get("base", 0)
-                if base < 0:
-                    base = 0
+def _config_values(m):
+    """設定モジュールから (data, chr, output) を取り出します。未定義の項目はNone。"""
+    md = vars(m)
+    return md.get("data"), md.get("chr"), md.get("output")
 
-                address = base + p.get("offset", 0)
-                if f.tell() != address:
-                    f.seek(address)
 
-                f.write(bytes(p["opcode"]))
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
+# 読み込み済み設定ファイルの更新時刻 (sys.modules のモジュール名 -> 更新時刻)
+_config_mtimes = {}
+
+
+@functools.lru_cache(maxsize=8)
+def _load_config_file(path, mtime):
+    """設定ファイルをパス指定で読み込みます。
+
+       同一プロセス内で同じファイルを繰り返し読み込む場合の再実行を避けるため、
+       (絶対パス, 更新時刻) をキーにキャッシュする。
+
+    Args:
+        path (str): 設定ファイルの実パス。
+        mtime (float): 設定ファイルの更新時刻 (キャッシュ無効化用)。
+
+    Returns:
+        tuple: (data, chr, output)
+    """
+    import hashlib
+    import importlib.util
+
+    # 実パスごとに固定のモジュール名で sys.modules へ登録する
+    # (キャッシュから外れた後の再読み込みでも、未更新なら登録済みのモジュールを使う)
+    key = "pz80_cfg_" + hashlib.md5(path.encode(), usedforsecurity=False).hexdigest()
+    m = sys.modules.get(key)
+    if m is not None and _config_mtimes.get(key) == mtime:
+        return _config_values(m)
+
+    spec = importlib.util.spec_from_file_location(key, path)
+    if not (spec and spec.loader):
+        return None, None, None
+    m = importlib.util.module_from_spec(spec)
+    # 更新されたファイルは同じモジュール名で登録し直す (古いモジュールは置き換える)
+    sys.modules[key] = m
+    try:
+        spec.loader.exec_module(m)
+    except BaseException:
+        del sys.modules[key]
+        _config_mtimes.pop(key, None)
+        raise
+    _config_mtimes[key] = mtime
+
+    return _config_values(m)
+
+
+def _load_config(name):
+    """設定ファイル、または設定モジュールを読み込みます。
+
+    Args:
+        name (str): 設定ファイルのパス、またはモジュール名。
+
+    Returns:
+        tuple: (data, chr, output) 未定義の項目はNone。
+    """
+    # ファイルパスとして存在する場合は直接ロード
+    if os.path.exists(name):
+        path = os.path.realpath(name)
+        try:
+            return _load_config_file(path, os.path.getmtime(path))
+        except Exception as e:
+            print(f"Error: Failed to load config file '{name}': {e}", file=sys.stderr)
+            sys.exit(1)
+
+    import importlib
+
+    # モジュールとしてインポート試行
+    module_name = name
+    if module_name.endswith('.py'):
+        module_name = module_name[:-3]
+
+    # カレントディレクトリをパスに追加
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    try:
+        m = importlib.import_module(module_name)
+    except ModuleNotFoundError:
+        print(f"Error: Config module '{name}' not found.", file=sys.stderr)
         sys.exit(1)
 
+    return _config_values(m)
+
+
 def command_disasm(args):
     """逆アセンブラコマンドハンドラ。
 
     Args:
         args (argparse.Namespace): コマンドライン引数。
     """
+    from pz80 import disasm
+
     # ---- ここからメイン------------------------------------
 
     # raw file読み込み
-    images = [0 for _ in range(0x10000)]
-    try:
-        size = 0
-        for r in args.input:
-            with open(r, mode="rb") as f:
-                try:
-                    data = f.read()
-                    length = len(data)
-                    if size + length > 0x10000:
-                        print("Error: Total input size exceeds 64KB limit (Z80 address space).", file=sys.stderr)
-                        sys.exit(1)
-                        
-                    images[size : size + length] = data
-                    size += length
-                except EOFError:
-                    print(f"Error: Failed to read file: {r}", file=sys.stderr)
+    images = bytearray(0x10000)
+    size = 0
+    missing = []
+    for r in args.input:
+        try:
+            f = open(r, mode="rb")
+        except FileNotFoundError:
+            missing.append(r)
+            continue
+
+        with f:
+            # 見つからないファイルがあればエラー確定のため、以降は存在確認のみ行う
+            if missing:
+                continue
+            try:
+                # 中間バッファを作らずイメージへ直接読み込む
+                length = f.readinto(memoryview(images)[size:])
+                if f.read(1):
+                    print("Error: Total input size exceeds 64KB limit (Z80 address space).", file=sys.stderr)
                     sys.exit(1)
 
-    except FileNotFoundError:
-        print(f"Error: Input file not found: {r}", file=sys.stderr)
+                size += length
+            except EOFError:
+                print(f"Error: Failed to read file: {r}", file=sys.stderr)
+                sys.exit(1)
+
+    if missing:
+        for r in missing:
+            print(f"Error: Input file not found: {r}", file=sys.stderr)
         sys.exit(1)
 
     # output関数設定
@@ -97,97 +195,83 @@ def command_disasm(args):
     # 設定ファイル読み込み
     ope = disasm.Disasm()
     if args.config is not None:
-        m = None
-        # ファイルパスとして存在する場合は直接ロード
-        if os.path.exists(args.config):
-            try:
-                spec = importlib.util.spec_from_file_location("config_module", args.config)
-                if spec and spec.loader:
-                    m = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(m)
-            except Exception as e:
-                print(f"Error: Failed to load config file '{args.config}': {e}", file=sys.stderr)
-                sys.exit(1)
-        else:
-            # モジュールとしてインポート試行
-            module_name = args.config
-            if module_name.endswith('.py'):
-                module_name = module_name[:-3]
-            
-            # カレントディレクトリをパスに追加
-            if os.getcwd() not in sys.path:
-                sys.path.insert(0, os.getcwd())
-
-            try:
-                m = importlib.import_module(module_name)
-            except ModuleNotFoundError:
-                print(f"Error: Config module '{args.config}' not found.", file=sys.stderr)
-                sys.exit(1)
-        
-        if m:
-            if hasattr(m, 'data'):
-                ope.datamap = m.data
-            if hasattr(m, 'chr'):
-                ope.cpu.strmap = m.chr
-            if hasattr(m, 'output'):
-                output = m.output
-
-    for p in ope.datamap:
-        if p[0] > p[1]:
-            print(f"Error: Invalid data range in config: start=0x{p[0]:04X} > end=0x{p[1]:04X}", file=sys.stderr)
-            sys.exit(1)
+        data, strmap, func = _load_config(args.config)
+        if data is not None:
+            # 読み込み結果はキャッシュされるため、変更が及ばないよう複製して渡す
+            ope.datamap = [list(p) for p in data]
+        if strmap is not None:
+            ope.cpu.strmap = strmap
+        if func is not None:
+            output = func
+
+    bad = next(((i, p) for i, p in enumerate(ope.datamap) if p[0] > p[1]), None)
+    if bad is not None:
+        i, p = bad
+        print(f"Error: Invalid data range #{i} in config: start=0x{p[0]:04X} > end=0x{p[1]:04X}", file=sys.stderr)
+        sys.exit(1)
 
     # 逆アセンブル
     out = ope.exec(args.start, images, size)
 
     if(args.output is not None):
-        stdout = sys.stdout
-        with open(args.output, "w") as f:
-            sys.stdout = f
-            output(out, args.nodump)
-            sys.stdout = stdout
+        with open(args.output, "w", buffering=1 << 20, encoding="utf-8", newline="\n") as f:
+            if output is output_default:
+                output(out, args.nodump, stream=f)
+            else:
+                # 設定ファイルの出力関数は print() で標準出力へ書く前提のため差し替える
+                with contextlib.redirect_stdout(f):
+                    output(out, args.nodump)
 
     else:
         output(out, args.nodump)
 
 
-def output_default(dis, sw):
+@functools.cache
+def _addr_table():
+    """ダンプ出力用のアドレス文字列テーブル (0x0000-0xFFFF) を返します。
+
+       初回のダンプ出力時に一度だけ生成し、以降はプロセス内で再利用する。
+    """
+    return [f"0x{i:04X}" for i in range(0x10000)]
+
+
+def output_default(dis, sw, stream=None):
     """逆アセンブラのデフォルト出力関数。
 
     Args:
         dis (list): 逆アセンブルデータリスト。
         sw (bool): ダンプなしフラグ (True: アドレスとオペコードを隠す)。
+        stream (TextIO, optional): 出力先。Noneの場合は標準出力。
     """
     lbsize = 5
     # ラベル表示用に、最も長いラベルの長さを事前に計算しておく（オプション）
     # max_label_len = max((len(p.get("label", "")) for p in dis), default=0)
 
+    # 桁揃え: < は左寄せ
+    fmt = f"{{}} {{:<12}} {{:<{lbsize + 1}}} {{}}".format
+    addr_table = None if sw else _addr_table()
+
+    lines = []
     for p in dis:
         if sw: # ダンプなし
             label = p.get("label", "")
             if label:
-                print(label)
+                lines.append(label)
             if p.get("asm"):
                 indent = "    " if p.get("opcode") else ""
-                print(f'{indent}{p["asm"]}')
+                lines.append(f'{indent}{p["asm"]}')
         else:
-            addr_str = f'0x{p.get("address", 0):04X}'
-            op_bytes = p.get("opcode", [])
-            op_str = " ".join(f"{b:02X}" for b in op_bytes)
-            label_str = p.get("label", "")
-            asm_str = p.get("asm", "")
-            # f-stringの桁揃え機能を使用: < は左寄せ、> は右寄せ
-            print(f"{addr_str} {op_str:<12} {label_str:<{lbsize+1}} {asm_str}")
+            op_str = bytes(p.get("opcode", b"")).hex(" ").upper()
+            lines.append(fmt(addr_table[p["address"] & 0xFFFF], op_str, p.get("label", ""), p["asm"]))
 
+    # print()の行単位呼び出しを避け、まとめて1回で出力する
+    if lines:
+        lines.append("")
+        (sys.stdout if stream is None else stream).write("\n".join(lines))
 
-def main():
-    # --------------------------------------------------------
-    # main
-    # --------------------------------------------------------
-    parser = argparse.ArgumentParser(description=f"Z80 assembler & disassembler v{__about__.__version__}")
-    subparsers = parser.add_subparsers()
 
-    # disasm
+def _add_disasm_parser(subparsers):
+    """disasm サブコマンドのパーサーを登録します。"""
     parser_disasm = subparsers.add_parser("disasm", help="Z80 disassembler")
     parser_disasm.add_argument("-i", "--input", nargs="*", required=True, help="input images")
     parser_disasm.add_argument("-c", "--config", help="disasm config file")
@@ -196,13 +280,42 @@ def main():
     parser_disasm.add_argument("-o", "--output", help="output file")
     parser_disasm.set_defaults(handler=command_disasm)
 
-    # asm
+
+def _add_asm_parser(subparsers):
+    """asm サブコマンドのパーサーを登録します。"""
     parser_asm = subparsers.add_parser("asm", help="Z80 assembler")
     parser_asm.add_argument("-f", "--file", required=True, help="asm file")
     parser_asm.add_argument("-o", "--output", required=True, help="output file(bin)")
     parser_asm.add_argument("-s", "--size", help="*option* : output file(bin) size")
     parser_asm.set_defaults(handler=command_asm)
 
+
+_SUBCOMMANDS = {
+    "disasm": _add_disasm_parser,
+    "asm": _add_asm_parser,
+}
+
+
+def main():
+    # --------------------------------------------------------
+    # main
+    # --------------------------------------------------------
+    parser = argparse.ArgumentParser(description=f"Z80 assembler & disassembler v{__about__.__version__}")
+    subparsers = parser.add_subparsers()
+
+    # 実行するサブコマンド (最初のオプション以外の引数) のパーサーのみ構築する
+    # (ヘルプ表示を含む場合や不明なコマンドの場合は、選択肢を全て表示するため全て構築)
+    argv = sys.argv[1:]
+    add_parser = None
+    if "-h" not in argv and "--help" not in argv:
+        command = next((a for a in argv if not a.startswith("-")), None)
+        add_parser = _SUBCOMMANDS.get(command)
+    if add_parser is not None:
+        add_parser(subparsers)
+    else:
+        for add_parser in _SUBCOMMANDS.values():
+            add_parser(subparsers)
+
     args = parser.parse_args()
 
     if(hasattr(args, "handler")):
@@ -1,9 +1,30 @@
 #!/usr/bin/env python3
 
+import functools
 import re
+import sys
 
 from . import directives, evaluator, z80
 
+# 正規表現はモジュール読み込み時に1回だけコンパイルし、全インスタンスで共有する
+# ラベル先頭文字
+_RE_LABEL_START = re.compile(r"[A-Za-z@]")
+# トークン抽出用 (文字列リテラル / コメント開始 / 記号 / その他の語)
+_RE_TOKEN = re.compile(
+    r"""(?P<str>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""
+    r"|(?P<cmt>;)"
+    r"|(?P<punct>[():,+\-*/])"
+    r"|(?P<word>[^\s():,+\-*/;]+)"
+)
+# 文字列リテラルもコメントも含まない行用 (記号 / その他の語のみ)
+_RE_SIMPLE_TOKEN = re.compile(r"[():,+\-*/]|[^\s():,+\-*/]+")
+
+# ニーモニック / 疑似命令の分類 (所属判定用)
+# ビット番号をニーモニック側のテンプレートに含む命令
+_BIT_MNEMONICS = frozenset(("bit", "res", "set"))
+_DB_DIRECTIVES = frozenset(("db", "defb"))
+_DW_DIRECTIVES = frozenset(("dw", "defw"))
+
 
 class Asm:
     """Z80アセンブラクラス"""
@@ -11,26 +32,71 @@ class Asm:
     def __init__(self):
         """Asmクラスを初期化します。"""
         self.cpu = z80.Z80()
+        # 予約語の所属判定用
+        self._reserved = self.cpu.reserved_set
+        # トークン化の時点で小文字へ正規化する語 (予約語と疑似命令)
+        self._keywords = self._reserved | {"org", "equ", "defb", "defw"}
+        # 数値オペランドを取らないニーモニック (オペランド解析を省略できる)
+        self._no_expr = self.cpu.no_expr_mnemonics
+        # トークンの正規化結果キャッシュ (元のトークン -> 正規化済みトークン)
+        self._token_norm = {}
         self.directive_handler = directives.DirectiveHandler(self)
         self._reset()
-        self._re_whitespace = re.compile(r"\s+")
-        self._re_label_start = re.compile(r"^[A-Za-z@]+")
-        # 文字列リテラル抽出用
-        self._re_string_literal = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'")
-        # プレースホルダー復元用
-        self._re_placeholder = re.compile(r"__STRING_LITERAL_(\d+)__")
+        # opcode() の検索結果キャッシュ (入力トークン列 -> 命令情報)
+        self._opcode_cache = {}
 
     def _reset(self):
         """アセンブル状態をリセットします。"""
-        self.labelmap = []       # アセンブラソースから抽出したラベルリスト
-        self.label2address = []  # ラベルに対応するアドレスリスト
+        # アセンブラソースから抽出したシンボル (種別 / 名前 / 値 を並列リストで保持)
+        self.sym_types = []
+        self.sym_names = []
+        self.sym_values = []
+        self.sym_index = {}      # シンボル名 -> 並列リストのインデックス
+        self.label2address = {}  # ラベルに対応するアドレス (ラベル -> アドレス)
         self.defined_labels = None
+        # label2address で評価した式の値キャッシュ (式のトークン列 -> 値)
+        self._expr_cache = {}
+
+    @property
+    def labelmap(self):
+        """ラベルリスト [{"type": 種別, "symbol": シンボル, "value": 値}, ] を返します。
+
+           シンボルは並列リスト (sym_types / sym_names / sym_values) で保持しており、
+           返すリストはその複製のため、変更する場合は labelmap へ代入すること
+        """
+        return [
+            {"type": t, "symbol": n, "value": v}
+            for t, n, v in zip(self.sym_types, self.sym_names, self.sym_values)
+        ]
+
+    @labelmap.setter
+    def labelmap(self, p):
+        """ラベルリストを設定します。
+
+        Args:
+            p (list): ラベルリスト [{"type": 種別, "symbol": シンボル, "value": 値}, ]
+        """
+        self.sym_types = []
+        self.sym_names = []
+        self.sym_values = []
+        self.sym_index = {}
+        for sym in p:
+            self._add_symbol(sym["type"], sym["symbol"], sym["value"])
+
+    def _add_symbol(self, ope, symbol, value):
+        """シンボルを並列リストへ登録します。"""
+        self.sym_index[symbol] = len(self.sym_names)
+        self.sym_types.append(ope)
+        self.sym_names.append(symbol)
+        self.sym_values.append(value)
 
     def tokenize(self, src):
         """ソースコード1行をトークンリストに変換します。
 
            トークンリスト例 : ['ld', '(', 'hl', ')', ',', 'a'] ※コメント文字 ";" 以降の要素は削除する
            文字列リテラル "..." や '...' は1つのトークンとして扱う
+           予約語・疑似命令は小文字に正規化する (ラベルは大文字小文字を区別するため元のまま)
+           (正規化後のトークンがエラーメッセージにも使われるため、メッセージ中の予約語・疑似命令は小文字で表示される)
 
         Args:
             src (str): ソース
@@ -38,36 +104,43 @@ class Asm:
         Returns:
             ['ld', '(', 'hl', ')', ',', 'a'] : トークンリスト
         """
-        # 文字列リテラルを一時的にプレースホルダーに置き換える
-        strings = []
-        def string_replacer(match):
-            strings.append(match.group(0))
-            return f"__STRING_LITERAL_{len(strings)-1}__"
-
-        # 文字列リテラルを保護してからコメントを除去
-        # (文字列内のセミコロンがコメントとして扱われないようにするため)
-        src_replaced = self._re_string_literal.sub(string_replacer, src)
-        src_without_comment = src_replaced.split(';', 1)[0]
-
-        # 指定記号(filters)前後にスペース挿入してトークンリスト生成
-        filters = "():,+-*/" # ; はコメントとして処理済のため除外
-        for p in filters:
-            src_without_comment = src_without_comment.replace(p, " " + p + " ")
-
-        bf = self._re_whitespace.split(src_without_comment)
-        ws = [p for p in bf if (p != "")]
-
-        # プレースホルダーを元の文字列リテラルに戻す
-        final_tokens = []
-        for token in ws:
-            placeholder_match = self._re_placeholder.match(token)
-            if placeholder_match:
-                index = int(placeholder_match.group(1))
-                final_tokens.append(strings[index])
-            else:
-                final_tokens.append(token)
-
-        return final_tokens
+        norm = self._token_norm.get
+        normalize = self._normalize_token
+
+        # 引用符もコメントも無い行 (大半の命令行) は単純な分割のみで済ませる
+        if '"' not in src and "'" not in src and ";" not in src:
+            return [norm(t) or normalize(t) for t in _RE_SIMPLE_TOKEN.findall(src)]
+
+        # 1回の走査でトークンを抽出する
+        # (文字列リテラルを先に照合するため、文字列内の ; や記号は分割されない)
+        tokens = []
+        for m in _RE_TOKEN.finditer(src):
+            kind = m.lastgroup
+            if kind == "cmt":
+                break
+            t = m.group()
+            # 文字列リテラルはそのまま残す
+            tokens.append(t if kind == "str" else norm(t) or normalize(t))
+
+        return tokens
+
+    def _normalize_token(self, token):
+        """トークンを正規化します。
+
+           予約語・疑似命令は小文字に揃え、以降の比較で lower() を不要にする
+           ラベルなどその他の語は大文字小文字を区別するため元のまま残す
+           いずれも sys.intern() で共有し、辞書検索の比較を高速にする
+
+        Args:
+            token (str): トークン
+
+        Returns:
+            str: 正規化済みトークン
+        """
+        low = token.lower()
+        result = sys.intern(low if low in self._keywords else token)
+        self._token_norm[token] = result
+        return result
 
     def source(self, asm):
         """アセンブラソースからアセンブルリストを生成
@@ -96,28 +169,37 @@ class Asm:
         Args:
             asm (list): アセンブルリスト
         """
-        # EQU総当たり置換
-        for m in self.labelmap:
-            if m.get("type") == "equ":
-                for q in asm:
-                    if "asm" in q:
-                        for r in range(len(q["asm"])):
-                            if m["symbol"] == q["asm"][r]:
-                                q["asm"][r] = m["value"]
+        # シンボル -> 値 の辞書を作成し、全トークンを1回だけ走査して置換
+        equ_map = {n: v for t, n, v in zip(self.sym_types, self.sym_names, self.sym_values) if t == "equ"}
+        if not equ_map:
+            return
+
+        for q in asm:
+            toks = q.get("asm")
+            if not toks:
+                continue
+            for r, t in enumerate(toks):
+                v = equ_map.get(t)
+                if v is not None:
+                    toks[r] = v
 
     def opcode(self, s):
         """オペコード検索
 
            小文字変換してCPUコードのリストから検索
+           同じ命令パターンは繰り返し現れるため、検索結果はトークン列をキーにキャッシュする
 
         Args:
             s (list): アセンブルリスト
 
         Returns:
-            list: アセンブルリストと一致するCPUコードテーブル値
+            list: アセンブルリストと一致する命令情報 (z80.AsmCode)
         """
-        key = tuple([y.lower() for y in s])
-        item = self.cpu.asm_map.get(key)
+        key = tuple(s)
+        try:
+            item = self._opcode_cache[key]
+        except KeyError:
+            item = self._opcode_cache[key] = self.cpu.asm_code_map.get(tuple(map(str.lower, s)))
         return [item] if item else []
 
     def op0(self, s):
@@ -129,9 +211,31 @@ class Asm:
         Returns:
             tuple: (オペコードリスト, fixupリスト)
         """
-        ref = s[:]
-        u = self.opcode(ref)
-        return (u[0]["code"], []) if u else ([], [])
+        u = self.opcode(s)
+        # テーブルの bytes から新しいリストを作る (出力がテーブルと共有されないように)
+        return (list(u[0].code), []) if u else ([], [])
+
+    def _lookup_with_placeholder(self, s, d, placeholder):
+        """数値または式の箇所をプレースホルダーに一時的に置換してオペコードを検索します。
+
+           トークンリストを複製せずにその場で書き換え、検索後に元へ戻す
+
+        Args:
+            s (list): アセンブルリスト
+            d (dict): label()で生成したリスト
+            placeholder (str): プレースホルダー文字列 ("0x{0}" など)
+
+        Returns:
+            list: アセンブルリストと一致するCPUコードテーブル値
+        """
+        start = d["location"]
+        end = start + d.get("length", 1)
+        saved = s[start:end]
+        s[start:end] = [placeholder]
+        try:
+            return self.opcode(s)
+        finally:
+            s[start : start + 1] = saved
 
     def op1(self, s, d):
         """オペコード1バイト
@@ -149,20 +253,16 @@ class Asm:
         r = []
         fixups = []
         val = d["value"]
-        ref = s[:]
-        length = d.get("length", 1)
-        # 数値または式の箇所をプレースホルダーに置換
-        ref[d["location"] : d["location"] + length] = ["0x{0}"]
-        p = self.opcode(ref)
+        p = self._lookup_with_placeholder(s, d, "0x{0}")
         if not p:
             return r, fixups
 
         u = p[0]
-        r = list(u["code"])
+        code = u.code
 
         # 相対アドレス対応
-        if u.get("rel") is not None:
-            r.append(0x00) # プレースホルダー
+        if u.rel is not None:
+            r = [*code, 0x00] # プレースホルダー
             fixups.append({"offset": len(r) - 1, "size": 1, "type": "rel", "src": d})
             return r, fixups
 
@@ -173,15 +273,14 @@ class Asm:
         val_byte = val & 0xFF
 
         # 0xddcb, 0xfdcb 対応
-        e = u.get("ext")
+        e = u.ext
         if e is not None:
-            r.append(val_byte) # プレースホルダーまたは値
-            r.append(e)
+            r = [*code, val_byte, e] # val_byte はプレースホルダーまたは値
             # DDCB/FDCBの変位dはオフセット2 (0:DD, 1:CB, 2:d, 3:ext)
             fixups.append({"offset": 2, "size": 1, "type": "byte", "src": d})
             return r, fixups
 
-        r.append(val_byte)
+        r = [*code, val_byte]
         fixups.append({"offset": len(r) - 1, "size": 1, "type": "byte", "src": d})
         return r, fixups
 
@@ -205,21 +304,14 @@ class Asm:
         if not (-32768 <= val <= 65535):
             raise ValueError(f"Word value out of range: {val}")
 
-        ref = s[:]
-        length = d.get("length", 1)
-        # 数値または式の箇所をプレースホルダーに置換
-        ref[d["location"] : d["location"] + length] = ["0x{1}{0}"]
-        u = self.opcode(ref)
-        
+        u = self._lookup_with_placeholder(s, d, "0x{1}{0}")
         if not u:
             return r, fixups
 
-        r = list(u[0]["code"])
         # 符号付き対応のためマスク処理
         val_word = val & 0xFFFF
-        r.append(val_word & 0xFF)
-        r.append((val_word >> 8) & 0xFF)
-        
+        r = [*u[0].code, val_word & 0xFF, (val_word >> 8) & 0xFF]
+
         fixups.append({"offset": len(r) - 2, "size": 2, "type": "word", "src": d})
         return r, fixups
 
@@ -244,15 +336,19 @@ class Asm:
         if not (-128 <= val0 <= 255) or not (-128 <= val1 <= 255):
             raise ValueError(f"Operand value out of range: {val0}, {val1}")
 
-        ref = s[:]
-        ref[d0["location"]] = "0x{0}"  # 数値の箇所をバイト指定文字列に置換
-        ref[d1["location"]] = "0x{1}"  # 数値の箇所をバイト指定文字列に置換
-
-        u = self.opcode(ref)
+        # 数値の箇所をバイト指定文字列に一時的に置換して検索し、元に戻す
+        loc0, loc1 = d0["location"], d1["location"]
+        saved0, saved1 = s[loc0], s[loc1]
+        s[loc0] = "0x{0}"
+        s[loc1] = "0x{1}"
+        try:
+            u = self.opcode(s)
+        finally:
+            s[loc0] = saved0
+            s[loc1] = saved1
         if not u:
             return r, fixups
-        r = list(u[0]["code"])
-        r.extend([val0 & 0xFF, val1 & 0xFF])
+        r = [*u[0].code, val0 & 0xFF, val1 & 0xFF]
         fixups.append({"offset": len(r) - 2, "size": 1, "type": "byte", "src": d0})
         fixups.append({"offset": len(r) - 1, "size": 1, "type": "byte", "src": d1})
         return r, fixups
@@ -262,7 +358,7 @@ class Asm:
         token = tokens[index]
 
         # 予約語は式の開始点ではない
-        if token.lower() in self.cpu.reserved:
+        if token in self._reserved:
             return False
 
         # カンマや閉じ括弧は式の開始点ではない
@@ -270,17 +366,27 @@ class Asm:
             return False
 
         # IX/IYレジスタの直後の +/- は区切り文字であり、式の開始ではない
-        if token in ['+', '-'] and index > 0 and tokens[index - 1].lower() in ('ix', 'iy'):
+        if token in ['+', '-'] and index > 0 and tokens[index - 1] in ('ix', 'iy'):
             return False
 
         # (HL) のようなアドレス参照の開き括弧は式の開始点ではない
-        if token == '(' and index + 2 < len(tokens) and tokens[index+2] == ')' and tokens[index+1].lower() in self.cpu.reserved:
+        if token == '(' and index + 2 < len(tokens) and tokens[index+2] == ')' and tokens[index+1] in self._reserved:
             return False
 
         return True
 
     def _find_expression_end(self, tokens, start_index):
         """式の開始インデックスから、式が終わるインデックスを見つけます。"""
+        # 次のカンマまでに括弧が無ければ、そのカンマ (無ければ行末) が式の終端となる
+        # (大半のオペランドはこの場合に該当するため、トークン単位の走査を省く)
+        try:
+            comma = tokens.index(',', start_index)
+        except ValueError:
+            comma = len(tokens)
+        segment = tokens[start_index:comma]
+        if '(' not in segment and ')' not in segment:
+            return comma
+
         end_index = start_index
         paren_balance = 0
         while end_index < len(tokens):
@@ -299,9 +405,14 @@ class Asm:
     def _parse_operands(self, asmlist):
         """トークンリストからオペランドを抽出・解析する"""
         asm = asmlist["asm"]
+        # 数値オペランドを取らない命令は、式の解析を行わずに確定させる
+        # (rst 0x38 / im 1 などの数値はテンプレートと直接照合する)
+        if asm[0] in self._no_expr:
+            return []
+
         rs = []
         i = 0
-        is_directive_with_expr = asm[0].lower() in ['dw', 'defw', 'db', 'defb']
+        is_directive_with_expr = asm[0] in ('dw', 'defw', 'db', 'defb')
 
         while i < len(asm):
             # DW, DBなどの疑似命令では、括弧で始まる複雑な式を単一オペランドとして扱う。
@@ -345,46 +456,49 @@ class Asm:
         Returns:
             tuple : (オペコードリスト, fixupリスト)
         """
-        if asmlist.get("asm") is None:
+        asm = asmlist.get("asm")
+        if asm is None:
             return [], []
 
-        asm = asmlist["asm"]
-
         rs = self._parse_operands(asmlist)
 
-        # オペコード検索用のテンプレートを作成
+        # オペコード検索用のテンプレート
         # bit/res/set や条件付きジャンプなど、オペランドがニーモニックに含まれるケースに対応
-        template_asm = list(asm)
-        mnemonic = asm[0].lower()
+        # (op1/op2/op3 はプレースホルダーを一時的に書き込み、検索後に元へ戻すため複製は不要)
+        template_asm = asm
+        mnemonic = asm[0]
 
-        if mnemonic in ["bit", "res", "set"]:
+        if mnemonic in _BIT_MNEMONICS:
             if len(rs) > 0:
                 rs.pop(0)
 
         # オペコード確定
-        match(len(rs)):
-            case 0:
-                # 数値無し
-                op, fixups = self.op0(template_asm)
+        n = len(rs)
+        if n == 0:
+            # 数値無し
+            op, fixups = self.op0(template_asm)
 
-            case 1:
-                # 1オペランド (バイト or ワード)
-                op, fixups = self.op1(template_asm, rs[0])
-                if len(op) == 0:
-                    op, fixups = self.op2(template_asm, rs[0])
+        elif n == 1:
+            # 1オペランド (バイトで検索し、該当しなければワードで検索)
+            op, fixups = self.op1(template_asm, rs[0])
+            if not op:
+                op, fixups = self.op2(template_asm, rs[0])
 
-            case 2:
-                # 2オペランド (バイト x 2)
-                op, fixups = self.op3(template_asm, rs[0], rs[1])
+        elif n == 2:
+            # 2オペランド (バイト x 2)
+            op, fixups = self.op3(template_asm, rs[0], rs[1])
 
-            case _:
-                raise ValueError(f"Invalid operand count or format in line {asmlist['line']}: {asmlist['asm']}")
+        else:
+            raise ValueError(f"Invalid operand count or format in line {asmlist['line']}: {asmlist['asm']}")
 
         return op, fixups
 
     def pass0(self, src):
         """アセンブル事前準備
 
+           tokenize() を経ずに作られたトークンリストも受け付けるため、
+           予約語・疑似命令を tokenize() と同じく小文字に正規化してから処理する
+
         Args:
             src (list): アセンブルリスト
 
@@ -397,88 +511,161 @@ class Asm:
 
             [{"line": line, "label": asm[0], "base": start, "offset": 0},]
         """
-        len_org   = 2
-        len_equ   = 4
-        len_label = 2
         result = []
         start = -1
         defined_symbols = set()
+        norm = self._token_norm.get
+        normalize = self._normalize_token
         for entry in src:
-            asm = entry["asm"]
-            line = entry["line"]
-            maxword = 0xFFFF
-            ope     = None
-
-            # 種別判定
-            if (len(asm) == len_org) and (asm[0].lower() == "org"):
-                # ORG行
-                ope = "org"
-                try:
-                    start = int(asm[1], 0)
+            asm = [norm(t) or normalize(t) for t in entry["asm"]]
+            start, _ = self._pass0_entry(asm, entry["line"], start, defined_symbols, result)
 
-                except ValueError:
-                    raise ValueError(f"Invalid address format for ORG in line {line}: {asm[1]}")
+        return result
 
-            if (len(asm) == len_equ) and (asm[1] == ":") and (asm[2].lower() == "equ"):
-                # EQU行
-                ope = "equ"
+    def _pass0_entry(self, asm, line, start, defined_symbols, result):
+        """アセンブル事前準備 (1行分)
 
-            elif (len(asm) == len_label) and (asm[1] == ":"):
-                # ラベルのみ
-                ope = "label"
+           行を種別判定し、ラベルを登録してアセンブル処理のためのリストへ追加する
 
-            elif (len(asm) > len_label) and (asm[1] == ":"):
-                # ラベル + オペコード
-                ope = "label+opcode"
+        Args:
+            asm (list): トークンリスト
+            line (int): 行番号
+            start (int): 現在のベースアドレス
+            defined_symbols (set): 定義済みシンボル (重複チェック用)
+            result (list): アセンブル処理のためのリスト (追加先)
 
-            if ope is None:
-                result.append({"line": line, "asm": asm, "base": start, "offset": 0})
-                continue
+        Returns:
+            tuple: (ベースアドレス, 種別) 種別は "org" / "equ" / "label" / "label+opcode" / None
+        """
+        len_org   = 2
+        len_equ   = 4
+        len_label = 2
+        maxword = 0xFFFF
+        ope     = None
+
+        # 大半を占める命令行 (2番目のトークンが ":" でなく、ORGでもない行) は判定を省略
+        if len(asm) < len_label or (asm[1] != ":" and asm[0] != "org"):
+            result.append({"line": line, "asm": asm, "base": start, "offset": 0})
+            return start, ope
+
+        # 種別判定
+        if (len(asm) == len_org) and (asm[0] == "org"):
+            # ORG行
+            ope = "org"
+            try:
+                start = int(asm[1], 0)
+
+            except ValueError:
+                raise ValueError(f"Invalid address format for ORG in line {line}: {asm[1]}")
+
+        if (len(asm) == len_equ) and (asm[1] == ":") and (asm[2] == "equ"):
+            # EQU行
+            ope = "equ"
+
+        elif (len(asm) == len_label) and (asm[1] == ":"):
+            # ラベルのみ
+            ope = "label"
+
+        elif (len(asm) > len_label) and (asm[1] == ":"):
+            # ラベル + オペコード
+            ope = "label+opcode"
+
+        if ope is None:
+            result.append({"line": line, "asm": asm, "base": start, "offset": 0})
+            return start, ope
+
+        # 予約語チェック (予約語は tokenize() / pass0() で小文字に正規化済み)
+        if asm[0] in self._reserved:
+            raise ValueError(f"Invalid label '{asm[0]}' in line {line}: Reserved word")
+
+        # 重複チェック
+        if asm[0] in defined_symbols:
+            raise ValueError(f"Duplicate label definition '{asm[0]}' in line {line}")
+
+        # 先頭文字チェック
+        if _RE_LABEL_START.match(asm[0]) is None:
+            raise ValueError(f"Invalid label format '{asm[0]}' in line {line}")
+
+        # 数値チェック(equのみ)
+        if ope == "equ":
+            try:
+                val = int(asm[3], 0)
+                if (val >= maxword) or (val < 0):
+                    raise ValueError(f"EQU value out of range (0-65535) in line {line}: {asm[0]} = {asm[3]}")
+
+            except ValueError:
+                raise ValueError(f"Invalid value format for EQU in line {line}: {asm[3]}")
+
+        # type, symbol, value形式でリスト登録
+        match ope:
+            case "equ":
+                self._add_symbol(ope, asm[0], asm[3])
+                defined_symbols.add(asm[0])
+
+            case "label":
+                self._add_symbol(ope, asm[0], 0)
+                defined_symbols.add(asm[0])
+                result.append({"line": line, "label": asm[0], "base": start, "offset": 0})
+
+            case "label+opcode":
+                # ラベルとオペコードを2行へ分離
+                self._add_symbol(ope, asm[0], 0)
+                defined_symbols.add(asm[0])
+                u = asm[:]
+                result.append({"line": line, "label": asm[0], "base": start, "offset": 0})
+                del u[0:2]
+                result.append({"line": line, "asm": u, "base": start, "offset": 0})
+
+            case _:
+                pass
+
+        return start, ope
+
+    def _frontend(self, lines):
+        """行リストからアセンブル処理のためのリストを生成します。
+
+           source() / pass0() / equ() と同じ処理を、行ごとに1回の走査で行う
 
-            # 予約語チェック
-            if asm[0].lower() in self.cpu.reserved:
-                raise ValueError(f"Invalid label '{asm[0]}' in line {line}: Reserved word")
+        Args:
+            lines (list): ソースコードの行リスト
 
-            # 重複チェック
-            if asm[0] in defined_symbols:
-                raise ValueError(f"Duplicate label definition '{asm[0]}' in line {line}")
+        Returns:
+            list : アセンブル処理のためのリスト (pass0() と同じ形式、EQU置換済み)
+        """
+        result = []
+        start = -1
+        defined_symbols = set()
+        equ_map = {}
+        equ_pos = 0  # 最後にEQUが定義された時点の result の長さ
+        tokenize = self.tokenize
+        pass0_entry = self._pass0_entry
+
+        for line, src in enumerate(lines, 1):
+            asm = tokenize(src)
+            if not asm:
+                continue
 
-            # 先頭文字チェック
-            if self._re_label_start.search(asm[0]) is None:
-                raise ValueError(f"Invalid label format '{asm[0]}' in line {line}")
+            n = len(result)
+            start, ope = pass0_entry(asm, line, start, defined_symbols, result)
 
-            # 数値チェック(equのみ)
             if ope == "equ":
-                try:
-                    val = int(asm[3], 0)
-                    if (val >= maxword) or (val < 0):
-                        raise ValueError(f"EQU value out of range (0-65535) in line {line}: {asm[0]} = {asm[3]}")
-
-                except ValueError:
-                    raise ValueError(f"Invalid value format for EQU in line {line}: {asm[3]}")
-
-            # type, symbol, value形式でリスト登録
-            match ope:
-                case "equ":
-                    self.labelmap.append({"type": ope, "symbol": asm[0], "value": asm[3]})
-                    defined_symbols.add(asm[0])
-
-                case "label":
-                    self.labelmap.append({"type": ope, "symbol": asm[0], "value": 0})
-                    defined_symbols.add(asm[0])
-                    result.append({"line": line, "label": asm[0], "base": start, "offset": 0})
-
-                case "label+opcode":
-                    # ラベルとオペコードを2行へ分離
-                    self.labelmap.append({"type": ope, "symbol": asm[0], "value": 0})
-                    defined_symbols.add(asm[0])
-                    u = asm[:]
-                    result.append({"line": line, "label": asm[0], "base": start, "offset": 0})
-                    del u[0:2]
-                    result.append({"line": line, "asm": u, "base": start, "offset": 0})
-
-                case _:
-                    pass
+                equ_map[asm[0]] = asm[3]
+                equ_pos = n
+                continue
+
+            # この行で追加したアセンブル行へ、定義済みのEQUを置換
+            if equ_map:
+                for q in result[n:]:
+                    toks = q.get("asm")
+                    if toks:
+                        toks[:] = [equ_map.get(t, t) for t in toks]
+
+        # 定義より前の行で使われているEQUを置換
+        if equ_pos:
+            for q in result[:equ_pos]:
+                toks = q.get("asm")
+                if toks:
+                    toks[:] = [equ_map.get(t, t) for t in toks]
 
         return result
 
@@ -493,12 +680,17 @@ class Asm:
 
             [{"line": line, "label": asm[0], "base": start, "offset": 0},]
 
+        Returns:
+            list : pass2で解決が必要な行 (前方参照を含む行) のリスト (pass2 の pending へ渡す)
         """
         current_offset = 0
         last_base = None
         
-        # 高速化のために定義済みラベルのセットを事前に作成
-        self.defined_labels = {m["symbol"] for m in self.labelmap}
+        # 定義済みラベルの所属判定用 (シンボル索引のキービューをそのまま使う)
+        self.defined_labels = self.sym_index.keys()
+        self._expr_cache.clear()
+        # pass2で解決が必要な行 (前方参照を含む行) の一覧
+        pending = []
 
         try:
             for item in asm:
@@ -507,43 +699,76 @@ class Asm:
                     current_offset = 0
                     last_base = item["base"]
 
-                # asm行
-                if item.get("asm") is not None:
-                    mnemonic = item["asm"][0].lower()
+                # asm行 (辞書の検索は1回にまとめ、以降はローカル変数で扱う)
+                toks = item.get("asm")
+                if toks is not None:
+                    mnemonic = toks[0]
+                    # アドレス解決に使う処理 (Noneは解決不要)
+                    resolve = None
+
                     # DB/DEFB 疑似命令の処理
-                    if mnemonic in ["db", "defb"]:
-                        opcodes = self.directive_handler.process_db_pass1(item)
-                        item.update({"base": last_base, "offset": current_offset, "opcode": opcodes})
-                        current_offset += len(opcodes)
-                        continue  # 通常のオペコード処理をスキップ
+                    if mnemonic in _DB_DIRECTIVES:
+                        op = self.directive_handler.process_db_pass1(item)
 
                     # DW/DEFW 疑似命令の処理
-                    elif mnemonic in ["dw", "defw"]:
-                        opcodes = self.directive_handler.process_dw_pass1(item)
-                        item.update({"base": last_base, "offset": current_offset, "opcode": opcodes})
-                        current_offset += len(opcodes)
-                        continue
-
-                    # アセンブル
-                    op, fixups = self.asm2op(item)
-                    if not op:
-                        raise ValueError(f"Invalid instruction or syntax in line {item['line']}: {' '.join(item['asm'])}")
+                    elif mnemonic in _DW_DIRECTIVES:
+                        op = self.directive_handler.process_dw_pass1(item)
+                        if item["fixups"]:
+                            resolve = self.directive_handler.process_dw_pass2
+
+                    else:
+                        # アセンブル
+                        op, fixups = self.asm2op(item)
+                        if not op:
+                            raise ValueError(f"Invalid instruction or syntax in line {item['line']}: {' '.join(toks)}")
+                        item["fixups"] = fixups
+                        if fixups:
+                            resolve = self._pass2_instruction
 
                     # アドレス更新
-                    item.update({"base": last_base, "offset": current_offset, "opcode": op, "fixups": fixups})
+                    item["base"] = last_base
+                    item["offset"] = current_offset
+                    item["opcode"] = op
                     current_offset += len(op)
 
+                    # 後方参照のみの行はここで解決し、前方参照を含む行のみpass2へ回す
+                    item["needs_pass2"] = resolve is not None and self._resolve_in_pass1(item, resolve)
+                    if item["needs_pass2"]:
+                        pending.append(item)
+                    continue
+
                 # label行
-                elif item.get("label") is not None:
-                    # アドレス確定
-                    adr = last_base + current_offset
-                    # ラベル - アドレステーブル更新
-                    self.label2address.append({"label": item["label"], "address": adr})
+                label = item.get("label")
+                if label is not None:
+                    # アドレス確定 (ラベル - アドレステーブル更新)
+                    self.label2address[label] = last_base + current_offset
                     # ラベルのオフセット更新
-                    item.update({"offset": current_offset})
+                    item["offset"] = current_offset
         finally:
             self.defined_labels = None
 
+        return pending
+
+    def _resolve_in_pass1(self, item, resolve):
+        """定義済みのラベルのみで、行のアドレス解決を試みます。
+
+           解決できない行はエラーの種類 (前方参照 / 範囲外など) を問わずpass2へ回す
+           (pass2で同じエラーが発生するため、エラーの報告順はpass1の全行の検査の後、
+           ソース順となる)
+
+        Args:
+            item (dict): アセンブルリストの1行
+            resolve (callable): アドレス解決処理 (_pass2_instruction など)
+
+        Returns:
+            bool: pass1で解決できず、pass2での解決が必要な場合はTrue
+        """
+        try:
+            resolve(item, self.label2address)
+        except ValueError:
+            return True
+        return False
+
     def _evaluate_expression(self, tokens, start_index, label_map, line_num):
         """
         ExpressionEvaluatorを使用して、トークンリストから式を評価します。
@@ -556,11 +781,24 @@ class Asm:
         if not expr_tokens:
             return None, 0
 
+        # label2address での評価結果はキャッシュする
+        # (ラベルは1回のパス中に1度だけ登録され値が変わらないため、評価できた式の値は以降も同じ)
+        key = tuple(expr_tokens)
+        cache = self._expr_cache if label_map is self.label2address else None
+        if cache is not None:
+            value = cache.get(key)
+            if value is not None:
+                return value, consumed
+
         # Pass 1では、label_mapはNoneです。検証のために定義済みラベルのセットを渡します。
         defined_labels_pass1 = self.defined_labels if label_map is None else None
-        evaluator_instance = evaluator.ExpressionEvaluator(expr_tokens, label_map, line_num, self.cpu, defined_labels_pass1)
+        # evaluate() は構文解析済みの命令列 (式ごとにキャッシュ) を評価する
+        # (トークンはタプルで渡し、キャッシュのキーとしてそのまま使わせる)
+        evaluator_instance = evaluator.ExpressionEvaluator(key, label_map, line_num, self.cpu, defined_labels_pass1)
         value = evaluator_instance.evaluate()
-        
+
+        if cache is not None:
+            cache[key] = value
         return value, consumed
 
     def _pass2_instruction(self, p, label_map):
@@ -570,62 +808,73 @@ class Asm:
             return
 
         opcode = p["opcode"]
+        tokens = p["asm"]
+        line = p["line"]
+        evaluate = self._evaluate_expression
 
         for fixup in fixups:
-            src = fixup["src"]
             # Pass1で特定した位置から式を再評価
-            address, consumed = self._evaluate_expression(p["asm"], src["location"], label_map, p["line"])
-            
+            address, consumed = evaluate(tokens, fixup["src"]["location"], label_map, line)
+
             if address is None:
                 # 式が解決できない場合はスキップ（あるいはエラー）
                 continue
 
-            if fixup["type"] == "rel":
-                # 相対ジャンプ
-                pc = p["base"] + p["offset"] + len(opcode)
-                offset = address - pc
-                if not (-128 <= offset <= 127):
-                    raise ValueError(f"Relative jump out of range ({offset}) in line {p['line']}")
-                if offset < 0:
-                    offset += 0x100
-                opcode[fixup["offset"]] = offset & 0xFF
-
-            elif fixup["type"] == "word":
+            kind = fixup["type"]
+            pos = fixup["offset"]
+            if kind == "rel":
+                # 相対ジャンプ (基準は次の命令のアドレス)
+                offset = address - (p["base"] + p["offset"] + len(opcode))
+                # -128..127 の範囲内なら offset + 128 は 0..255 (上位ビットが立たない)
+                if (offset + 128) >> 8:
+                    raise ValueError(f"Relative jump out of range ({offset}) in line {line}")
+                opcode[pos] = offset & 0xFF
+
+            elif kind == "word":
                 # 16bit値
                 if not (-32768 <= address <= 65535):
-                    raise ValueError(f"Word value out of range: {address} in line {p['line']}")
-                opcode[fixup["offset"]] = address & 0xFF
-                opcode[fixup["offset"] + 1] = (address >> 8) & 0xFF
+                    raise ValueError(f"Word value out of range: {address} in line {line}")
+                opcode[pos] = address & 0xFF
+                opcode[pos + 1] = (address >> 8) & 0xFF
 
-            elif fixup["type"] == "byte":
+            elif kind == "byte":
                 # 8bit値
                 if not (-128 <= address <= 255):
-                    raise ValueError(f"Byte value out of range: {address} in line {p['line']}")
-                opcode[fixup["offset"]] = address & 0xFF
+                    raise ValueError(f"Byte value out of range: {address} in line {line}")
+                opcode[pos] = address & 0xFF
 
-    def pass2(self, asm):
+    def pass2(self, asm, pending=None):
         """アセンブル処理 その2
 
         Args:
             list : アセンブル処理のためのリスト
             [{"line": line, "asm": asm, "base": start, "offset": 0, "opcode": [n, n, n,]},]
+            pending (list, optional): pass1の戻り値。省略時は全行を対象とする
         """
-        # ラベルマップの作成 (リストから辞書へ変換して高速化)
-        label_map = {item["label"]: item["address"] for item in self.label2address}
-        
-        # self.labelmap の値を更新 (asm2op で参照されるため)
-        for m in self.labelmap:
-            if m["symbol"] in label_map:
-                m["value"] = label_map[m["symbol"]]
-
-        for p in asm:
-            if "asm" not in p:
+        # ラベルマップ (pass1で辞書として構築済み)
+        label_map = self.label2address
+        self._expr_cache.clear()
+
+        # シンボル値をアドレスで更新
+        sym_index = self.sym_index
+        sym_values = self.sym_values
+        for sym, adr in label_map.items():
+            i = sym_index.get(sym)
+            if i is not None:
+                sym_values[i] = adr
+
+        # pass1の戻り値 (未解決の行) が渡された場合は、その行のみを処理する
+        items = asm if pending is None else pending
+
+        for p in items:
+            # pass1で解決済みの行は対象外
+            if "asm" not in p or not p.get("needs_pass2", True):
                 continue
 
-            mnemonic = p["asm"][0].lower()
+            mnemonic = p["asm"][0]
             
             # DW/DEFW 疑似命令の処理
-            if mnemonic in ["dw", "defw"]:
+            if mnemonic in _DW_DIRECTIVES:
                 self.directive_handler.process_dw_pass2(p, label_map)
                 continue
             # 通常命令
@@ -645,24 +894,13 @@ class Asm:
         self._reset()
 
         # ------------------------------------------------------
-        # アセンブルリスト src を生成
-        #   フォーマットは下記の通り
-        #      [{"line": 行番号, "asm": トークンリスト}, ]
-        # ------------------------------------------------------
-        src = self.source(lines)
-
-        # ------------------------------------------------------
-        # src から
-        # (1) ラベルリスト生成
-        # (2) ORGがあればべースアドレスを再定義
-        # (3) アセンブルリスト asm を生成
-        # ----- -------------------------------------------------
-        asm = self.pass0(src)
-
-        # ------------------------------------------------------
-        # EQUを数値へ置換
+        # 行リストから
+        # (1) トークン化 (source)
+        # (2) ラベルリスト生成、ORGがあればベースアドレスを再定義 (pass0)
+        # (3) EQUを数値へ置換 (equ)
+        # を1回の走査で行い、アセンブルリスト asm を生成
         # ------------------------------------------------------
-        self.equ(asm)
+        asm = self._frontend(lines)
 
         # ------------------------------------------------------
         # アセンブル(pass1)
@@ -687,16 +925,16 @@ class Asm:
         #       ]
         # (2) ラベル - アドレステーブルを生成
         #       フォーマットは以下の通り
-        #       [{"label": ラベル, "address": アドレス},]
+        #       {ラベル: アドレス, }
         #
         # ------------------------------------------------------
-        self.pass1(asm)
+        pending = self.pass1(asm)
         
         # ------------------------------------------------------
         # アセンブル(pass2)
         # (1) 仕上げ...ラベルを使っているオペランドのアドレスを解決
         # ------------------------------------------------------
-        self.pass2(asm)
+        self.pass2(asm, pending)
             
         return asm
 
@@ -717,10 +955,27 @@ class Asm:
 
         return self.assemble_lines(fs)
 
+    def exec_source(self, text):
+        """アセンブル処理メイン (文字列入力)
+
+           ファイルを介さずにソースコードの文字列を直接アセンブルする
+
+        Args:
+            text (str): ソースコード
+
+        Returns:
+            list : アセンブル処理のためのリスト
+        """
+        return self.assemble_lines(text.splitlines())
+
 
+@functools.lru_cache(maxsize=128)
 def assemble(source: str) -> bytes:
     """Z80ソースコードをアセンブルしてバイナリデータを返します。
 
+       結果はソースの内容だけで決まるため、同じソースの再アセンブルはキャッシュを返す
+       (エラーになったソースはキャッシュされない)
+
     Args:
         source (str): アセンブリソースコード
 
@@ -731,35 +986,20 @@ def assemble(source: str) -> bytes:
     lines = source.splitlines()
     asm_result = assembler.assemble_lines(lines)
 
-    # メモリイメージの構築 (64KB空間)
+    # メモリイメージの構築
     # 簡易実装として、出力されるデータが存在する最小アドレスから最大アドレスまでを返す
-    memory = {}
-    min_addr = 0xFFFF
-    max_addr = 0
-
-    for line in asm_result:
-        if "opcode" in line and line["opcode"]:
-            base = line.get("base", 0)
-            offset = line.get("offset", 0)
-            addr = base + offset
-            opcode = line["opcode"]
-            
-            for i, byte in enumerate(opcode):
-                current_addr = addr + i
-                memory[current_addr] = byte
-                if current_addr < min_addr:
-                    min_addr = current_addr
-                if current_addr > max_addr:
-                    max_addr = current_addr
-
-    if not memory:
+    # (ORG未指定時のベースアドレス -1 は、コマンドラインでの出力と同様に 0 とみなす)
+    emit = [(max(0, line.get("base", 0)) + line.get("offset", 0), line["opcode"]) for line in asm_result if line.get("opcode")]
+    if not emit:
         return b""
 
+    min_addr = min(addr for addr, _ in emit)
+    max_addr = max(addr + len(opcode) for addr, opcode in emit)
+
     # 最小アドレスから最大アドレスまでのバイト列を生成 (隙間は0x00埋め)
-    size = max_addr - min_addr + 1
-    result = bytearray(size)
-    
-    for addr, byte in memory.items():
-        result[addr - min_addr] = byte
+    result = bytearray(max_addr - min_addr)
+    for addr, opcode in emit:
+        start = addr - min_addr
+        result[start : start + len(opcode)] = bytes(opcode)
 
     return bytes(result)
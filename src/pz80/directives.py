@@ -1,6 +1,14 @@
 #!/usr/bin/env python3
 
 import ast
+from itertools import groupby
+
+from .evaluator import decode_string_literal, parse_int
+
+
+def _is_comma(token):
+    """オペランド区切りのカンマかどうかを判定します。"""
+    return token == ','
 
 
 class DirectiveHandler:
@@ -18,7 +26,8 @@ class DirectiveHandler:
 
     def process_db_pass1(self, item):
         """DB/DEFB 疑似命令のオペランドを解析します (Pass 1)。"""
-        opcodes = []
+        # バイト列として蓄積し、最後にリストへ変換する
+        opcodes = bytearray()
         operands = item["asm"][1:]
 
         for operand in operands:
@@ -26,41 +35,72 @@ class DirectiveHandler:
                 continue
 
             # 文字列リテラルの処理
-            if operand.startswith('"') or operand.startswith("'"):
+            if operand[0] in ('"', "'"):
                 try:
-                    decoded_string = ast.literal_eval(operand)
-                    opcodes.extend(ord(c) for c in decoded_string)
+                    decoded_string = decode_string_literal(operand)
                 except (ValueError, SyntaxError) as e:
                     raise ValueError(f"Invalid string literal in line {item['line']}: {operand}") from e
+                # 1文字ずつの ord() ではなく、バイト列へ一括変換して追加
+                try:
+                    opcodes += decoded_string.encode("latin-1")
+                except UnicodeEncodeError as e:
+                    raise ValueError(f"DB string contains non-byte character in line {item['line']}: {operand}") from e
             else:
                 # 数値の処理
-                try:
-                    value = int(operand, 0)
-                except ValueError as e:
-                    raise ValueError(f"Invalid operand for DB in line {item['line']}: {operand}") from e
+                value = parse_int(operand)
+                if value is None:
+                    raise ValueError(f"Invalid operand for DB in line {item['line']}: {operand}")
 
-                if not (0 <= value <= 255):
+                # 0-255 以外 (負数を含む) は下位8bit以外のビットが立つ
+                if value & ~0xFF:
                     raise ValueError(f"DB value out of byte range (0-255) in line {item['line']}: {value}")
                 opcodes.append(value)
-        return opcodes
+        return list(opcodes)
+
+    def _parse_dw_literal(self, token):
+        """DW命令の単一トークンをリテラルとして解釈します。
+
+           先頭文字でリテラルになり得るかを判定し、ラベルや式には ast.literal_eval を呼ばない
 
-    def _split_operands(self, tokens):
-        """トークンリストをカンマ区切りで分割してオペランドのリストを返します。"""
+        Returns:
+            int | str | None: リテラル値。リテラルでない場合 (ラベルまたは式) はNone。
+        """
+        c = token[0]
+        if c.isdigit():
+            # 10進/16進などの整数は int() で直接変換
+            value = parse_int(token)
+            if value is not None:
+                return value
+        elif c not in ('"', "'", '-', '+', '.'):
+            # 英字などで始まるトークンはラベルまたは式
+            return None
+
+        try:
+            if c in ('"', "'"):
+                return decode_string_literal(token)
+            return ast.literal_eval(token)
+        except (ValueError, SyntaxError):
+            # 有効なPythonリテラルではないため、ラベルまたは式とみなす
+            return None
+
+    def _split_operands(self, tokens, start=0):
+        """トークンリストをカンマ区切りで分割してオペランドのリストを返します。
+
+        Returns:
+            list: (先頭トークンのインデックス, オペランドのトークンリスト) のリスト
+        """
         operands_list = []
-        current_operand = []
-        for token in tokens:
-            if token == ',':
-                if current_operand:
-                    operands_list.append(current_operand)
-                current_operand = []
-            else:
-                current_operand.append(token)
-        if current_operand:
-            operands_list.append(current_operand)
+        i = start
+        # カンマ以外の連続したトークンをひとまとまりのオペランドとする (空のオペランドは除く)
+        for is_comma, g in groupby(tokens, _is_comma):
+            g = list(g)
+            if not is_comma:
+                operands_list.append((i, g))
+            i += len(g)
         return operands_list
 
     def _encode_dw_literal(self, value, token, line_num):
-        """DW命令のリテラル値をエンコードします。"""
+        """DW命令のリテラル値をリトルエンディアンの2バイトにエンコードします。"""
         if isinstance(value, str):
             if len(value) == 1:
                 val = ord(value)
@@ -68,61 +108,85 @@ class DirectiveHandler:
                 val = (ord(value[0]) << 8) | ord(value[1])
             else:
                 raise ValueError(f"String literal in DW must be 1 or 2 characters in line {line_num}: {token}")
-            return [val & 0xFF, (val >> 8) & 0xFF]
+            return (val & 0xFFFF).to_bytes(2, "little")
 
         elif isinstance(value, int):
             if not (0 <= value <= 65535):
                 raise ValueError(f"DW value out of word range (0-65535) in line {line_num}: {value}")
-            return [value & 0xFF, (value >> 8) & 0xFF]
+            return value.to_bytes(2, "little")
 
         else:
             raise ValueError(f"Unsupported literal type for DW in line {line_num}: {token}")
 
     def process_dw_pass1(self, item):
-        """DW/DEFW 疑似命令のオペランドを解析します (Pass 1)。"""
+        """DW/DEFW 疑似命令のオペランドを解析します (Pass 1)。
+
+           ラベルや式のオペランドはプレースホルダーを入れ、その位置を item["fixups"] に記録する
+           (Pass 2 では記録したオペランドのみを評価する)
+        """
         opcodes = []
-        operands_list = self._split_operands(item["asm"][1:])
+        fixups = []
+        operands_list = self._split_operands(item["asm"][1:], 1)
 
-        for operand_tokens in operands_list:
+        for location, operand_tokens in operands_list:
             # オペランドが単一トークンかどうかで処理を分岐
             if len(operand_tokens) == 1:
                 token = operand_tokens[0]
-                try:
-                    value = ast.literal_eval(token)  # Check if it's a valid literal
-                except (ValueError, SyntaxError):
-                    # 有効なPythonリテラルではないため、ラベルまたは式とみなす
-                    pass
-                else:
+                value = self._parse_dw_literal(token)
+                if value is not None:
                     # It is a literal, so encode it. This can raise ValueError for invalid values.
                     opcodes.extend(self._encode_dw_literal(value, token, item['line']))
                     continue
 
             # ラベルまたは式として扱う (プレースホルダーを挿入)
+            fixups.append({"offset": len(opcodes), "location": location})
             opcodes.extend([0x00, 0x00])
-            
+
+        item["fixups"] = fixups
         return opcodes
 
+    def _patch_dw(self, p, opcode, offset, address, token):
+        """DWのワード値を範囲チェックしてオペコードへ書き込みます。"""
+        if address is None:
+            raise ValueError(f"Undefined label or invalid expression in DW at line {p['line']}: {token}")
+
+        if not (0 <= address <= 65535):
+            raise ValueError(f"DW value out of word range (0-65535) in line {p['line']}: {address}")
+
+        # リトルエンディアンの2バイトをスライス代入で一度に書き込む
+        opcode[offset : offset + 2] = address.to_bytes(2, "little")
+
     def process_dw_pass2(self, p, label_map):
         """DW/DEFW 疑似命令のアドレス解決を行います (Pass 2)。"""
+        asm = p["asm"]
+        opcode = p["opcode"]
+
+        # Pass 1で記録したラベル/式のオペランドのみを評価
+        fixups = p.get("fixups")
+        if fixups is not None:
+            n = len(asm)
+            for fixup in fixups:
+                i = fixup["location"]
+                address, consumed = self.asm._evaluate_expression(asm, i, label_map, p["line"])
+                self._patch_dw(p, opcode, fixup["offset"], address, asm[i])
+                # 式がオペランドの末尾 (次のカンマまたは行末) まで続いていない場合
+                # (対応しない閉じ括弧など) は、残りのトークンを不正な式とする
+                end = i + consumed
+                if end < n and asm[end] != ',':
+                    self._patch_dw(p, opcode, fixup["offset"], None, asm[end])
+            return
+
+        # Pass 1を経ていない行は全オペランドを先頭から評価
         current_byte_offset = 0
         i = 1 # index into p["asm"], skip mnemonic
-        while i < len(p["asm"]):
-            token = p["asm"][i]
-            
-            if token == ',':
+        n = len(asm)
+        while i < n:
+            if asm[i] == ',':
                 i += 1
                 continue
 
-            address, consumed = self.asm._evaluate_expression(p["asm"], i, label_map, p["line"])
-
-            if address is None:
-                raise ValueError(f"Undefined label or invalid expression in DW at line {p['line']}: {p['asm'][i]}")
-
-            if not (0 <= address <= 65535):
-                raise ValueError(f"DW value out of word range (0-65535) in line {p['line']}: {address}")
+            address, consumed = self.asm._evaluate_expression(asm, i, label_map, p["line"])
+            self._patch_dw(p, opcode, current_byte_offset, address, asm[i])
 
-            p["opcode"][current_byte_offset] = address & 0xFF
-            p["opcode"][current_byte_offset + 1] = (address >> 8) & 0xFF
-            
             current_byte_offset += 2
-            i += consumed
\ No newline at end of file
+            i += consumed
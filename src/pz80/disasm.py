@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
-import re
+import itertools
+import sys
 
 from pz80 import z80
 
@@ -8,16 +9,81 @@ from pz80 import z80
 class Disasm:
     """Z80逆アセンブラクラス"""
 
+    # オペコード検索テーブル (クラスで共有、初回のインスタンス化時に構築)
+    _tables = None
+    # 1バイト命令の出力文字列 (1バイト目 -> 文字列、1バイト命令でなければNone)
+    _one_byte = None
+    # 出力用フォーマット文字列のキャッシュ (id(命令情報) -> (命令情報, フォーマット))
+    _formats = {}
+    # 解析結果キャッシュの上限件数
+    _DECODE_CACHE_SIZE = 4096
+
     def __init__(self):
         """Disasmクラスを初期化します。"""
         self.cpu = z80.Z80()
+        if Disasm._tables is None:
+            Disasm._tables = Disasm._build_tables(self.cpu.op_map)
+            # 全命令のフォーマット文字列を先に作っておく (逆アセンブル中は参照のみ)
+            for u in self.cpu.op_map.values():
+                self._format(u)
+            Disasm._one_byte = [
+                self._format(u) if isinstance(u, dict) and u["bytes"] == 1 else None
+                for u in Disasm._tables
+            ]
         self._datamap = []  # 逆アセンブル時にデーターとして扱うアドレス範囲テーブル
-        self._dispatch = {
-            1: self._handle_1byte,
-            2: self._handle_2bytes,
-            3: self._handle_3bytes,
-            4: self._handle_4bytes,
-        }
+        # 命令のバイト列 -> 解析結果 のキャッシュ (アドレスに依存しない命令のみ、古いものから破棄)
+        self._decode_cache = {}
+
+    @classmethod
+    def _build_tables(cls, op_map):
+        """オペコード検索用のテーブル (256要素リストの木) を構築します。
+
+           1バイト目で引いた要素が命令情報ならそこで確定、リストならプレフィックス
+           (CB / DD / ED / FD) なので2バイト目で引き直す。DDCB/FDCB系は3バイト目が
+           変位のため、4バイト目で引く。ハッシュ計算やタプル生成なしに検索できる
+
+        Args:
+            op_map (dict): 逆アセンブラ用マップ (オペコード -> 命令情報)
+
+        Returns:
+            list: 1バイト目で引くテーブル (要素は命令情報、次段のテーブル、またはNone)
+        """
+        t0 = [None] * 256
+        for key, u in op_map.items():
+            if len(key) == 1:
+                t0[key[0]] = u
+        for key, u in op_map.items():
+            if len(key) < 2:
+                continue
+            node = t0[key[0]]
+            if not isinstance(node, list):
+                node = t0[key[0]] = [None] * 256
+            if len(key) == 2:
+                node[key[1]] = u
+            else:
+                # DDCB/FDCB系: キーは (DD/FD, CB, 4バイト目)
+                ext = node[key[1]]
+                if not isinstance(ext, list):
+                    ext = node[key[1]] = [None] * 256
+                ext[key[2]] = u
+        return t0
+
+    def _lookup(self, mem, i, avail):
+        """テーブルを辿って命令情報を検索します。
+
+        Returns:
+            dict: 命令情報、見つからない場合 (バイト不足を含む) はNone。
+        """
+        u = self._tables[mem[i]]
+        if type(u) is list:
+            if avail < 2:
+                return None
+            u = u[mem[i + 1]]
+            if type(u) is list:
+                if avail < 4:
+                    return None
+                u = u[mem[i + 3]]
+        return u
 
     @property
     def datamap(self):
@@ -48,49 +114,88 @@ class Disasm:
 
     def _reladdr(self, x, y):
         """相対アドレス計算"""
-        maxword = 0xFFFF
-        return (((x - 0x100) if (x & 0x80) else (x & 0x7F)) + y + 2) & maxword
+        # (x ^ 0x80) - 0x80 で符号付き8bitへ分岐なしに変換
+        return (((x ^ 0x80) - 0x80) + y + 2) & 0xFFFF
+
+    def _make_format(self, u):
+        """命令情報から出力用のフォーマット文字列を生成します。
+
+        Args:
+            u (dict): 命令情報。
+
+        Returns:
+            str: フォーマット文字列、または出力できない命令の場合はNone。
+        """
+        tmpl = self._tmpl(u["asm"])
+        n = u["bytes"]
+        if n == 1:
+            return tmpl
+
+        if n == 2:
+            if u.get("rel") is not None:
+                return tmpl.replace("0x{0}", "L_{0:04X}")
+            return tmpl.replace("{0}", "{0:02X}")
+
+        if n == 3:
+            if u.get("jmp") is not None:
+                return tmpl.replace("0x{1}{0}", "L_{1:02X}{0:02X}")
+            op_type = u.get("type")
+            if op_type == "byte":
+                return tmpl.replace("{0}", "{0:02X}")
+            if op_type == "word":
+                return tmpl.replace("{0}", "{0:02X}").replace("{1}", "{1:02X}")
+            return None
+
+        if n == 4:
+            if u.get("ext") is not None:
+                # ddcb / fdcb
+                return tmpl.replace("{0}", "{0:02X}")
+            if u.get("type") in ("byte", "word"):
+                return tmpl.replace("{0}", "{0:02X}").replace("{1}", "{1:02X}")
+            return None
+
+        return None
+
+    def _format(self, u):
+        """命令の出力用フォーマット文字列を返します。
+
+           文字列の組み立ては命令ごとに1回だけ行い、以降はキャッシュを使う
+           (キャッシュには命令情報自体も保持し、id の再利用による取り違えを防ぐ)
+        """
+        c = Disasm._formats.get(id(u))
+        if c is not None and c[0] is u:
+            return c[1]
+        fmt = self._make_format(u)
+        if fmt is not None:
+            # 同じ文字列になる命令 (オペランド違いの同型命令など) で実体を共有する
+            fmt = sys.intern(fmt)
+        Disasm._formats[id(u)] = (u, fmt)
+        return fmt
 
     def _handle_1byte(self, u, opcode, adr):
-        return self._tmpl(u["asm"])
+        return self._format(u)
 
     def _handle_2bytes(self, u, opcode, adr):
-        tmpl = self._tmpl(u["asm"])
+        fmt = self._format(u)
         if u.get("rel") is not None:
-            return tmpl.replace("0x{0}", "L_{0:04X}").format(self._reladdr(opcode[1], adr))
-        return tmpl.replace("{0}", "{0:02X}").format(opcode[1])
+            return fmt.format(self._reladdr(opcode[1], adr))
+        return fmt.format(opcode[1])
 
     def _handle_3bytes(self, u, opcode, adr):
-        if u.get("jmp") is not None:
-            return self._tmpl(u["asm"]).replace("0x{1}{0}", "L_{1:02X}{0:02X}").format(opcode[1], opcode[2])
-
-        op_type = u.get("type")
-        if op_type == "byte":
-            return self._tmpl(u["asm"]).replace("{0}", "{0:02X}").format(opcode[2])
-
-        if op_type == "word":
-            return (
-                self._tmpl(u["asm"])
-                .replace("{0}", "{0:02X}")
-                .replace("{1}", "{1:02X}")
-                .format(opcode[1], opcode[2])
-            )
-        return None
+        fmt = self._format(u)
+        if fmt is None:
+            return None
+        if u.get("type") == "byte" and u.get("jmp") is None:
+            return fmt.format(opcode[2])
+        return fmt.format(opcode[1], opcode[2])
 
     def _handle_4bytes(self, u, opcode, adr):
+        fmt = self._format(u)
+        if fmt is None:
+            return None
         if u.get("ext") is not None:
-            # ddcb / fdcb
-            return self._tmpl(u["asm"]).replace("{0}", "{0:02X}").format(opcode[2])
-
-        op_type = u.get("type")
-        if op_type in ("byte", "word"):
-            return (
-                self._tmpl(u["asm"])
-                .replace("{0}", "{0:02X}")
-                .replace("{1}", "{1:02X}")
-                .format(opcode[2], opcode[3])
-            )
-        return None
+            return fmt.format(opcode[2])
+        return fmt.format(opcode[2], opcode[3])
 
     def op2asm(self, adr, opcode):
         """オペコードをアセンブリ文字列に変換します。
@@ -110,36 +215,163 @@ class Disasm:
                 return f"db 0x{opcode[0]:02X} ; [{self.cpu.strmap[opcode[0]]}]"
 
         # オペコード検索
-        u = None
-        # DDCB/FDCB系の場合は (DD, CB, ext) をキーにする
-        if len(opcode) == 4 and opcode[0] in (0xDD, 0xFD) and opcode[1] == 0xCB:
-            key = (opcode[0], opcode[1], opcode[3])
-            u = self.cpu.op_map.get(key)
-        else:
-            # 2バイトキー検索
-            if len(opcode) >= 2:
-                key = tuple(opcode[:2])
-                u = self.cpu.op_map.get(key)
-
-            # 1バイトキー検索 (2バイトで見つからなかった場合)
-            if u is None and len(opcode) >= 1:
-                key = tuple(opcode[:1])
-                u = self.cpu.op_map.get(key)
-
+        u = self._lookup(opcode, 0, len(opcode))
         if u is None:
             return None
 
         # ------------------------------------------------------
         # オペコードのバイト数で分岐
         # ------------------------------------------------------
-        if u["bytes"] == len(opcode):
-            handler = self._dispatch.get(u["bytes"])
-            if handler:
-                return handler(u, opcode, adr)
+        n = u["bytes"]
+        if n != len(opcode):
             return None
+        if n == 1:
+            return self._handle_1byte(u, opcode, adr)
+        elif n == 2:
+            return self._handle_2bytes(u, opcode, adr)
+        elif n == 3:
+            return self._handle_3bytes(u, opcode, adr)
+        elif n == 4:
+            return self._handle_4bytes(u, opcode, adr)
+        return None
+
+    def _decode(self, mem, i, avail, adr):
+        """指定アドレスの命令を最長一致で解析します。
+
+        Args:
+            mem (bytes): 入力イメージ。
+            i (int): 解析する位置 (mem のインデックス)。
+            avail (int): 位置から読み出せる残りバイト数。
+            adr (int): 解析する位置のアドレス。
+
+        Returns:
+            tuple: (バイト数, アセンブリ文字列, ラベル対象アドレス)、一致しない場合はNone。
+                   ラベル対象アドレスは相対/絶対ジャンプ命令の飛び先 (それ以外はNone)。
+        """
+        u = self._lookup(mem, i, avail)
+        if u is None:
+            return None
+
+        # 命令長が収まれば採用
+        n = u["bytes"]
+        if n == 1:
+            return 1, self._handle_1byte(u, None, adr), None
+        if n > avail:
+            return None
+
+        # ジャンプ先はラベル出力用に数値のまま返す
+        if n == 2 and u.get("rel") is not None:
+            # 相対ジャンプ: 飛び先を1回だけ計算して出力にも使う (アドレスに依存するためキャッシュしない)
+            target = self._reladdr(mem[i + 1], adr)
+            return n, self._format(u).format(target), target
+
+        # 同じバイト列の命令は同じ結果になるため、キャッシュを使う
+        key = mem[i : i + n]
+        cache = self._decode_cache
+        r = cache.get(key)
+        if r is not None:
+            return r
+
+        target = None
+        if n == 2:
+            p = self._handle_2bytes(u, key, adr)
+        elif n == 3:
+            p = self._handle_3bytes(u, key, adr)
+            if u.get("jmp") is not None:
+                target = mem[i + 1] | (mem[i + 2] << 8)
         else:
+            p = self._handle_4bytes(u, key, adr)
+        if not p:
             return None
 
+        r = (n, p, target)
+        if len(cache) >= self._DECODE_CACHE_SIZE:
+            # 最も古いエントリを破棄 (dict は挿入順を保持する)
+            del cache[next(iter(cache))]
+        cache[key] = r
+        return r
+
+    def _data_mask(self, start, size):
+        """入力イメージの各バイトがデータ範囲に含まれるかを表すマスクを生成します。
+
+           アドレスごとにデータマップを走査せず、範囲ごとにまとめて書き込む
+
+        Returns:
+            bytearray: mask[i] が 1 ならアドレス start + i はデータ。
+        """
+        mask = bytearray(size)
+        for p in self.datamap:
+            lo = max(p[0] - start, 0)
+            hi = min(p[1] - start + 1, size)
+            if lo < hi:
+                mask[lo:hi] = b"\x01" * (hi - lo)
+        return mask
+
+    def _image(self, start, images, size):
+        """逆アセンブル対象のイメージを bytes として返します。範囲外の場合はNoneを返します。
+
+           mem[i] がアドレス start + i に対応する (64KBのメモリイメージは作らない)
+        """
+        maxword = 0xFFFF
+        if size + start > maxword:
+            return None
+
+        if (start > maxword) or (start < 0):
+            return None
+
+        if isinstance(images, (bytes, bytearray, memoryview)):
+            # バッファ型はスライスを作らず、memoryview 経由で1回だけコピーする
+            return bytes(memoryview(images)[:size])
+        return bytes(images[:size])
+
+    def _scan(self, start, mem, size):
+        """イメージを先頭から逆アセンブルします。
+
+           逆アセンブルを最長一致(4バイト)から順に試行 (_decode) し、
+           結果は行ごとに (イメージ内の位置, バイト数, アセンブル文字列) のタプルで返す
+
+        Returns:
+            tuple: (行のリスト, ジャンプ先アドレスのセット)
+        """
+        rows = []
+        labels = set()  # ジャンプ先アドレス
+        # ループ内で使うメソッドはローカル変数に束縛しておく
+        decode = self._decode
+        data_mask = self._data_mask(start, size) if self.datamap else None
+        strmap = self.cpu.strmap
+        append = rows.append
+        one_byte = self._one_byte
+        i = 0
+        while i < size:
+            # データ範囲は1バイトずつ db として出力
+            if data_mask is not None and data_mask[i]:
+                c = mem[i]
+                append((i, 1, f"db 0x{c:02X} ; [{strmap[c]}]"))
+                i += 1
+                continue
+
+            # 1バイト命令はテーブル参照のみで出力
+            c = mem[i]
+            p = one_byte[c]
+            if p is not None:
+                append((i, 1, p))
+                i += 1
+                continue
+
+            r = decode(mem, i, size - i, start + i)
+            if r is not None:
+                n, p, target = r
+                append((i, n, p))
+                if target is not None:
+                    labels.add(target)
+                i += n
+            else:
+                # どの長さでもマッチしなかった場合、1バイトのデータとして処理
+                append((i, 1, f"db 0x{c:02X} ; Invalid Opcode"))
+                i += 1
+
+        return rows, labels
+
     def exec(self, start, images, size):
         """逆アセンブルを実行します。
 
@@ -151,87 +383,65 @@ class Disasm:
         Returns:
             list: 逆アセンブルされた行のリスト。
         """
-        maxword = 0xFFFF
-        mem = [0 for x in range(0x10000)]
-        lst = []
-
-        if size + start > maxword:
-            return lst
-
-        if (start > maxword) or (start < 0):
-            return lst
+        mem = self._image(start, images, size)
+        if mem is None:
+            return []
 
-        end = start + size - 1
-
-        # イメージロード
-        for p in range(size):
-            mem[p + start] = images[p]
-
-        adr = start
-        lst.append({"address": adr, "asm": f"org 0x{adr:04X}"})
         # ------------------------------------------------------
-        # 逆アセンブルを最長一致(4バイト)から順に試行
         # 結果は下記のフォーマットでリストへ保存
         #   [{"address":x = アドレス}, {"opcode":y = オペコード}, {"asm":z = アセンブル文字列}]
         # ------------------------------------------------------
-        while adr <= end:
-            p = None
-            opcode = []
-
-            # 最長の4バイトから順にマッチを試みる (Longest-match-first)
-            if adr + 3 <= end:
-                opcode_4b = mem[adr : adr + 4]
-                p = self.op2asm(adr, opcode_4b)
-                if p:
-                    opcode = opcode_4b
-
-            # 3バイトのマッチを試みる
-            if p is None and adr + 2 <= end:
-                opcode_3b = mem[adr : adr + 3]
-                p = self.op2asm(adr, opcode_3b)
-                if p:
-                    opcode = opcode_3b
-
-            # 2バイトのマッチを試みる
-            if p is None and adr + 1 <= end:
-                opcode_2b = mem[adr : adr + 2]
-                p = self.op2asm(adr, opcode_2b)
-                if p:
-                    opcode = opcode_2b
-            
-            # 1バイトのマッチを試みる
-            if p is None:
-                opcode_1b = mem[adr : adr + 1]
-                p = self.op2asm(adr, opcode_1b)
-                if p:
-                    opcode = opcode_1b
-
-            if p is not None:
-                lst.append({"address": adr, "opcode": opcode, "asm": p})
-                adr += len(opcode)
-            else:
-                # どの長さでもマッチしなかった場合、1バイトのデータとして処理
-                lst.append({"address": adr, "opcode": [mem[adr]], "asm": f"db 0x{mem[adr]:02X} ; Invalid Opcode"})
-                adr += 1
+        rows, labels = self._scan(start, mem, size)
+        lst = [{"address": start, "asm": f"org 0x{start:04X}"}]
+        lst += [
+            {"address": start + i, "opcode": [mem[i]] if n == 1 else list(mem[i : i + n]), "asm": p}
+            for i, n, p in rows
+        ]
 
         # ------------------------------------------------------
-        # ラベル情報抽出
+        # ラベル付与 (ジャンプ先は解析時に記録済みのため、出力文字列の検索は不要)
         # ------------------------------------------------------
-        labels = {}
-        for p in lst:
-            m = re.search(r"(L_([0-9a-fA-F]{4}))", p["asm"])
-            if m:
-                target_addr = int(m.group(2), 16)
-                labels[target_addr] = m.group(1) + ":"
+        # アドレス -> 行の対応表は持たず、行を1回走査してジャンプ先の行に付与する
+        # (先頭の org 行は除く)
+        if labels:
+            for p in itertools.islice(lst, 1, None):
+                adr = p["address"]
+                if adr in labels:
+                    p["label"] = f"L_{adr:04X}:"
 
-        # アドレス検索用のマップを作成 (高速化)
-        addr_map = {item["address"]: i for i, item in enumerate(lst)}
+        return lst
 
-        for target_addr, label_str in labels.items():
-            if target_addr in addr_map:
-                lst[addr_map[target_addr]].update(label=label_str)
+    def exec_text(self, start, images, size):
+        """逆アセンブルを実行し、テキストの行リストを返します。
 
-        return lst
+           exec() と同じ内容を、行ごとの辞書を作らずに文字列として出力する
+           (ラベル行は "L_xxxx:"、命令行はインデント付き)
+
+        Args:
+            start (int): 開始アドレス。
+            images (list): バイナリイメージデータ (startアドレスからのデータ列)。
+            size (int): データサイズ。
+
+        Returns:
+            list[str]: 逆アセンブルされたテキストの行リスト。
+        """
+        mem = self._image(start, images, size)
+        if mem is None:
+            return []
+
+        rows, labels = self._scan(start, mem, size)
+        lines = [f"org 0x{start:04X}"]
+        if not labels:
+            lines += ["    " + p for _, _, p in rows]
+            return lines
+
+        append = lines.append
+        for i, _, p in rows:
+            adr = start + i
+            if adr in labels:
+                append(f"L_{adr:04X}:")
+            append("    " + p)
+        return lines
 
 
 def disassemble(data: bytes, start_address: int = 0) -> list[str]:
@@ -244,21 +454,4 @@ def disassemble(data: bytes, start_address: int = 0) -> list[str]:
     Returns:
         list[str]: アセンブリコードの各行のリスト
     """
-    d = Disasm()
-    # execは (start, images, size) を受け取る
-    # imagesはバイト列でOK
-    result_data = d.exec(start_address, data, len(data))
-    
-    lines = []
-    for p in result_data:
-        label = p.get("label", "")
-        if label:
-            lines.append(label)
-        
-        asm_code = p.get("asm", "")
-        if asm_code:
-            # オペコードがある行（命令）はインデントする、ORGなどはインデントしない
-            indent = "    " if p.get("opcode") else ""
-            lines.append(f"{indent}{asm_code}")
-            
-    return lines
+    return Disasm().exec_text(start_address, data, len(data))
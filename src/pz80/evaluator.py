@@ -1,6 +1,120 @@
 #!/usr/bin/env python3
 
 import ast
+import functools
+import re
+import sys
+
+# 文字列リテラルのエスケープ (主要なもののみ自前で展開する)
+_ESCAPES = {
+    "n": "\n", "t": "\t", "r": "\r", "0": "\0", "a": "\a", "b": "\b", "f": "\f", "v": "\v",
+    "\\": "\\", "'": "'", '"': '"',
+}
+_RE_ESCAPE = re.compile(r"\\(x[0-9A-Fa-f]{2}|[ntrabfv\\'\"]|0(?![0-7]))")
+
+
+def _expand_escape(m):
+    """エスケープシーケンス1つを文字に変換します。"""
+    e = m.group(1)
+    return chr(int(e[1:], 16)) if e[0] == "x" else _ESCAPES[e]
+
+
+def decode_string_literal(token):
+    """引用符で囲まれた文字列リテラルのトークンを文字列に変換します。
+
+       エスケープを含まない場合や、主要なエスケープ (\\n, \\t, \\xNN など) のみの場合は
+       ast を使わずに変換する。その他のエスケープは ast.literal_eval に任せる
+
+    Args:
+        token (str): 文字列リテラル ("..." または '...')
+
+    Returns:
+        str: 変換後の文字列
+
+    Raises:
+        ValueError, SyntaxError: 文字列リテラルとして不正な場合
+    """
+    q = token[:1]
+    if len(token) < 2 or q not in ("'", '"') or token[-1] != q:
+        raise ValueError(f"Invalid string literal: {token}")
+
+    body = token[1:-1]
+    if "\\" not in body:
+        if q in body:
+            raise ValueError(f"Invalid string literal: {token}")
+        return body
+
+    rest = _RE_ESCAPE.sub("", body)
+    if "\\" in rest or q in rest:
+        # 8進数や \u などのエスケープ、または不正な文字列
+        return ast.literal_eval(token)
+    return _RE_ESCAPE.sub(_expand_escape, body)
+
+
+# 二項演算子の優先順位
+_BINARY_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2}
+# 演算子スタック上の優先順位 (単項演算子は二項演算子より強く結合する)
+_PRECEDENCE = {**_BINARY_PRECEDENCE, 'neg': 3, 'pos': 3}
+# 逆ポーランド記法の命令の種別 (定数 / ラベル / 演算子)
+_CONST = 0
+_LABEL = 1
+_OP = 2
+# 項の位置に現れるトークンの種別 (上記に加えて、開き括弧 / 単項演算子 / 文字リテラル)
+_LPAREN = 3
+_UNARY = 4
+_CHAR = 5
+_OPERAND_KINDS = {'(': (_LPAREN, '('), '-': (_UNARY, 'neg'), '+': (_UNARY, 'pos')}
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_int(token):
+    """数値リテラルを整数に変換します。数値でない場合はNoneを返します。
+
+       0 / 1 / 0xFF などの同じ数値トークンは繰り返し現れるため、結果をキャッシュする
+       (式の評価とDB/DW疑似命令で共用)
+    """
+    try:
+        return int(token, 0)
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def _operand_kind(token):
+    """項の位置にあるトークンを分類します。
+
+       同じトークンは繰り返し現れるため、分類結果 (数値はその値まで) をキャッシュする
+       文字リテラルはエラーに行番号が必要なため、値の変換は評価時に行う
+
+    Returns:
+        tuple: (種別, 値) 種別は _LPAREN / _UNARY / _CHAR / _CONST / _LABEL
+    """
+    kind = _OPERAND_KINDS.get(token)
+    if kind is not None:
+        return kind
+
+    # Character literals
+    if (token.startswith("'") and token.endswith("'")) or \
+       (token.startswith('"') and token.endswith('"')):
+        return _CHAR, token
+
+    # Numeric literals (数値でなければラベルとみなす)
+    # 数字/符号で始まらないトークンは int() を試さずにラベルとして扱う
+    c = token[:1]
+    if c.isdigit() or c in ('+', '-'):
+        value = parse_int(token)
+        if value is not None:
+            return _CONST, value
+    return _LABEL, token
+
+
+@functools.lru_cache(maxsize=4096)
+def _lower(token):
+    """トークンを小文字にして intern したものを返します。
+
+       予約語 (intern済みの frozenset) の判定で、ラベルごとに lower() の文字列を作らないようにする
+    """
+    return sys.intern(token.lower())
 
 
 class ExpressionEvaluator:
@@ -37,56 +151,20 @@ class ExpressionEvaluator:
     def _parse_char_literal(self, token):
         """文字リテラルを解析して数値を返します。"""
         try:
-            v = ast.literal_eval(token)
+            v = decode_string_literal(token)
         except (ValueError, SyntaxError) as e:
             raise ValueError(f"Invalid character literal '{token}' on line {self.line_num}") from e
 
-        if isinstance(v, str):
-            if len(v) == 1:
-                return ord(v)
-            elif len(v) == 2:
-                return (ord(v[0]) << 8) | ord(v[1])
-            raise ValueError("String literal in expression must be 1 or 2 characters")
-
-        raise ValueError(f"Invalid literal type '{token}' on line {self.line_num}")
-
-    def parse_factor(self):
-        """因子（数値、ラベル、または括弧で囲まれた式）を解析します。"""
-        token = self.peek()
-        if token is None:
-            raise ValueError(f"Unexpected end of expression on line {self.line_num}")
-
-        if token == '(':
-            self.consume()  # '('
-            val = self.parse_add_sub()
-            if self.peek() != ')':
-                raise ValueError(f"Mismatched parentheses in expression on line {self.line_num}")
-            self.consume()  # ')'
-            return val
-        
-        if token == '-':
-            self.consume()
-            return -self.parse_factor()
-        
-        if token == '+':
-            self.consume()
-            return self.parse_factor()
-
-        self.consume()
-        # Character literals
-        if (token.startswith("'") and token.endswith("'")) or \
-           (token.startswith('"') and token.endswith('"')):
-            return self._parse_char_literal(token)
-
-        # Numeric literals
-        try:
-            return int(token, 0)
-        except ValueError:
-            # 数値ではないため、ラベルとみなす
-            pass
+        if len(v) == 1:
+            return ord(v)
+        elif len(v) == 2:
+            return (ord(v[0]) << 8) | ord(v[1])
+        raise ValueError("String literal in expression must be 1 or 2 characters")
 
+    def _resolve_label(self, token):
+        """ラベルを値に変換します。"""
         # Reserved word check
-        if token.lower() in self.cpu.reserved:
+        if _lower(token) in self.cpu.reserved_set:
              raise ValueError(f"Reserved word '{token}' cannot be used in expression on line {self.line_num}")
 
         # Pass 2: マップからラベルを解決
@@ -103,40 +181,151 @@ class ExpressionEvaluator:
                      raise ValueError(f"Undefined symbol '{token}' in line {self.line_num}")
             return 0 # Placeholder value for pass 1
 
-    def parse_mul_div(self):
-        """乗算と除算を解析します。"""
-        val = self.parse_factor()
-        while self.peek() in ('*', '/'):
-            op = self.peek()
-            self.consume()
-            rhs = self.parse_factor()
-            if op == '*':
-                val *= rhs
-            else:
-                if rhs == 0:
-                    raise ValueError(f"Division by zero in expression on line {self.line_num}")
-                val //= rhs
-        return val
-
-    def parse_add_sub(self):
-        """加算と減算を解析します。"""
-        val = self.parse_mul_div()
-        while self.peek() in ('+', '-'):
-            op = self.peek()
-            self.consume()
-            rhs = self.parse_mul_div()
-            if op == '+':
-                val += rhs
+    def _apply(self, op, values):
+        """演算子を値スタックへ適用します。"""
+        if op == 'neg':
+            values[-1] = -values[-1]
+            return
+        if op == 'pos':
+            return
+
+        rhs = values.pop()
+        if op == '+':
+            values[-1] += rhs
+        elif op == '-':
+            values[-1] -= rhs
+        elif op == '*':
+            values[-1] *= rhs
+        else:
+            if rhs == 0:
+                raise ValueError(f"Division by zero in expression on line {self.line_num}")
+            values[-1] //= rhs
+
+    def _rpn(self):
+        """トークンリストを逆ポーランド記法の命令列として順に生成します。
+
+           再帰呼び出しを使わず、演算子スタックで変換する (操車場アルゴリズム)
+           単項の +/- は二項演算子より強く結合し、二項演算子は左結合
+           項は出現順に、演算子は適用できる時点で生成するため、生成順に評価すると
+           左から評価した場合と同じ順序でエラーが発生する
+
+        Yields:
+            tuple: (_CONST, 値) / (_LABEL, ラベル) / (_OP, 演算子)
+        """
+        tokens = self.tokens
+        n = len(tokens)
+        precedence = _PRECEDENCE
+        operand_kind = _operand_kind
+        ops = []  # 演算子スタック ('(' / 'neg' / 'pos' / 二項演算子)
+        expect_operand = True
+        i = 0
+
+        while True:
+            if expect_operand:
+                # 項 (または前置の単項演算子・開き括弧) の位置
+                if i >= n:
+                    self.idx = i
+                    raise ValueError(f"Unexpected end of expression on line {self.line_num}")
+                kind, arg = operand_kind(tokens[i])
+                i += 1
+                if kind == _LPAREN or kind == _UNARY:
+                    ops.append(arg)
+                else:
+                    if kind == _CHAR:
+                        kind, arg = _CONST, self._parse_char_literal(arg)
+                    yield kind, arg
+                    expect_operand = False
+                continue
+
+            # 二項演算子の位置
+            token = tokens[i] if i < n else None
+            p = _BINARY_PRECEDENCE.get(token)
+            if p is not None:
+                while ops and ops[-1] != '(' and precedence[ops[-1]] >= p:
+                    yield _OP, ops.pop()
+                ops.append(token)
+                i += 1
+                expect_operand = True
+                continue
+
+            # 式 (または括弧内の式) の終わり: 保留中の演算子を適用
+            while ops and ops[-1] != '(':
+                yield _OP, ops.pop()
+            if not ops:
+                break
+
+            # 括弧内の式は閉じ括弧で終わる必要がある
+            if token != ')':
+                self.idx = i
+                raise ValueError(f"Mismatched parentheses in expression on line {self.line_num}")
+            ops.pop()
+            i += 1
+
+        self.idx = i
+        if i != n:
+            raise ValueError(f"Invalid expression syntax near '{self.peek()}' on line {self.line_num}")
+
+    def run(self, rpn):
+        """逆ポーランド記法の命令列を評価します。
+
+        Args:
+            rpn (iterable): compile_expression() の結果などの命令列。
+
+        Returns:
+            int: 式の値。
+        """
+        values = []
+        for kind, arg in rpn:
+            if kind == _CONST:
+                values.append(arg)
+            elif kind == _LABEL:
+                values.append(self._resolve_label(arg))
             else:
-                val -= rhs
-        return val
+                self._apply(arg, values)
+        return values[0]
 
     def evaluate(self):
-        """トークンリストから式全体を評価します。"""
+        """トークンリストから式全体を評価します。
+
+           構文解析済みの命令列 (定数のみの式は値) を compile_expression() のキャッシュから取得し、
+           同じ式の再評価では構文解析を省略する
+           変換できない式は逐次評価して本来のエラーを発生させる
+        """
         if not self.tokens:
             return None
-        
-        value = self.parse_add_sub()
-        if self.idx != len(self.tokens):
-            raise ValueError(f"Invalid expression syntax near '{self.peek()}' on line {self.line_num}")
-        return value
+        rpn = compile_expression(tuple(self.tokens))
+        if rpn is None:
+            return self.run(self._rpn())
+        self.idx = len(self.tokens)
+        return self.run(rpn)
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_expression(tokens):
+    """式のトークン列を逆ポーランド記法の命令列に変換します。
+
+       同じ式を何度も評価する場合に、構文解析を1回で済ませるために使う
+       ラベルを含まない式は値まで計算しておく
+
+    Args:
+        tokens (tuple): 式を表す文字列トークンのタプル。
+
+    Returns:
+        tuple: 命令列。構文エラーなどで変換できない場合はNone
+               (ExpressionEvaluator.evaluate() で評価すれば、本来のエラーが発生する)。
+    """
+    if not tokens:
+        return None
+    ev = ExpressionEvaluator(tokens, None, None, None)
+    try:
+        rpn = tuple(ev._rpn())
+    except (ValueError, SyntaxError):
+        return None
+
+    if all(kind != _LABEL for kind, _ in rpn):
+        try:
+            return ((_CONST, ev.run(rpn)),)
+        except ValueError:
+            # ゼロ除算は評価時にエラーとする
+            pass
+    return rpn
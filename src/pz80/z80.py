@@ -1,5 +1,11 @@
 #!/usr/bin/env python3
 
+import sys
+from collections import namedtuple
+
+# アセンブラ用の命令情報 (code: 命令コードのbytes, rel: 相対ジャンプ指定, ext: DDCB/FDCB系の末尾バイト)
+AsmCode = namedtuple("AsmCode", ["code", "rel", "ext"])
+
 
 class Z80:
     """Z80 CPUクラス"""
@@ -7,8 +13,11 @@ class Z80:
     # クラスレベルでデータを保持（インスタンス化ごとの再生成を防ぐ）
     _initialized = False
     _reserved = []
+    _reserved_set = frozenset()
     _asm_map = {}
+    _asm_code_map = {}
     _op_map = {}
+    _no_expr_mnemonics = frozenset()
 
     # 逆アセンブル時に使用する 0x00-0xff に 対応する文字テーブル -> 外部ファイルでカスタマイズ可能
     _strmap_default = (
@@ -1432,6 +1441,10 @@ class Z80:
     @classmethod
     def _build_maps(cls):
         """クラスレベルのマップ（予約語、命令マップなど）を構築します。"""
+        # 命令テーブルのトークンを intern し、トークン化済みソース (intern済み) との比較を同一性判定で済ませる
+        for p in cls._codetbl:
+            p["asm"] = [sys.intern(t) for t in p["asm"]]
+
         # 予約語テーブルを生成
         r = set()
 
@@ -1471,15 +1484,24 @@ class Z80:
 
         cls._reserved = list(r)
         cls._reserved.sort()
+        # 所属判定用 (リストの線形探索を避ける)
+        cls._reserved_set = frozenset(sys.intern(w) for w in r)
+
+        # 数値オペランド (プレースホルダー "0x{...}") を取る形式が1つも無いニーモニック
+        mnemonics = {p["asm"][0] for p in cls._codetbl}
+        with_expr = {p["asm"][0] for p in cls._codetbl if any("0x{" in t for t in p["asm"])}
+        cls._no_expr_mnemonics = frozenset(mnemonics - with_expr)
 
         # 高速検索用マップの生成
         cls._asm_map = {}
+        cls._asm_code_map = {}
         cls._op_map = {}
 
         for item in cls._codetbl:
             # アセンブラ用マップ (ニーモニック -> 命令情報)
             asm_key = tuple(item["asm"])
             cls._asm_map[asm_key] = item
+            cls._asm_code_map[asm_key] = AsmCode(bytes(item["code"]), item.get("rel"), item.get("ext"))
 
             # 逆アセンブラ用マップ (オペコード -> 命令情報)
             if item.get("ext") is not None:
@@ -1502,11 +1524,26 @@ class Z80:
         """予約語リストを取得します。"""
         return self._reserved
 
+    @property
+    def reserved_set(self):
+        """予約語の集合 (所属判定用) を取得します。"""
+        return self._reserved_set
+
+    @property
+    def no_expr_mnemonics(self):
+        """数値オペランドを取らないニーモニックの集合を取得します。"""
+        return self._no_expr_mnemonics
+
     @property
     def asm_map(self):
         """アセンブラ用マップ（ニーモニック -> 命令情報）を取得します。"""
         return self._asm_map
 
+    @property
+    def asm_code_map(self):
+        """アセンブラ用の簡易マップ（ニーモニック -> AsmCode）を取得します。"""
+        return self._asm_code_map
+
     @property
     def op_map(self):
         """逆アセンブラ用マップ（オペコード -> 命令情報）を取得します。"""
@@ -1,6 +1,6 @@
 import pytest
 
-from pz80.asm import assemble
+from pz80.asm import Asm, assemble
 from pz80.z80 import Z80
 
 
@@ -132,8 +132,9 @@ def test_full_assembly_process(assembler):
     assert asm_list[1]["opcode"] == [0x3E, 0x10]
     assert asm_list[1]["offset"] == 0
     
-    # jp LABEL -> C3 00 00 (3バイト, アドレスはまだ仮の0000)
-    assert asm_list[2]["opcode"] == [0xC3, 0x00, 0x00]
+    # jp LABEL -> C3 00 01 (3バイト, LABELは定義済みの後方参照のためpass1で解決される)
+    assert asm_list[2]["opcode"] == [0xC3, 0x00, 0x01]
+    assert asm_list[2]["needs_pass2"] is False
     # オフセットは前の命令(2bytes)の分だけ進んでいるはず
     assert asm_list[2]["offset"] == 2
 
@@ -284,6 +285,13 @@ def test_tokenize_string_with_escapes(assembler):
     assert assembler.tokenize(src) == expected
 
 
+def test_tokenize_semicolon_in_string(assembler):
+    """文字列リテラル内のセミコロンがコメントとして扱われないことのテスト"""
+    src = 'db "A;B", \';\' ; comment'
+    expected = ["db", '"A;B"', ",", "';'"]
+    assert assembler.tokenize(src) == expected
+
+
 def test_char_literal_instruction(asm_process):
     """文字リテラルを含む命令のアセンブルテスト"""
     # ld a, '0' は ld a, 0x30 と解釈され、3E 30 になる
@@ -480,6 +488,11 @@ def test_assemble_function_basic():
     assert binary == b'\x3E\x10'
 
 
+def test_assemble_function_single_byte():
+    """assemble関数（ORG未指定の1バイト命令）のテスト"""
+    assert assemble("nop") == b'\x00'
+
+
 def test_assemble_function_with_gap():
     """assemble関数のギャップ埋め（パディング）テスト"""
     src = """
@@ -527,4 +540,193 @@ def test_assemble_function_with_label_backward_ref():
         jr START
     """
     binary = assemble(src)
-    assert binary == b'\x00\x18\xFD'
\ No newline at end of file
+    assert binary == b'\x00\x18\xFD'
+
+def test_asm2op_keeps_tokens_intact():
+    """オペコード検索後もトークンリストが元のまま残ること"""
+    a = Asm()
+    for line in ["ld a,(ix+5)", "ld (ix+2),0x10", "jp 0x1234", "ld a,2+3"]:
+        item = {"line": 1, "asm": a.tokenize(line)}
+        before = list(item["asm"])
+        op, _ = a.asm2op(item)
+        assert op
+        assert item["asm"] == before
+
+
+def test_labelmap_values():
+    """pass2完了後、ラベルリストにEQU値とラベルアドレスが反映されていること"""
+    a = Asm()
+    a.assemble_lines(["val: equ 0x10", "org 0x100", "start:", "nop", "loop: jr loop"])
+    assert a.labelmap == [
+        {"type": "equ", "symbol": "val", "value": "0x10"},
+        {"type": "label", "symbol": "start", "value": 0x100},
+        {"type": "label+opcode", "symbol": "loop", "value": 0x101},
+    ]
+
+
+def test_labelmap_setter(assembler):
+    """labelmap への代入でシンボルが登録し直されること"""
+    assembler.labelmap = [
+        {"type": "equ", "symbol": "VAL", "value": "5"},
+        {"type": "label", "symbol": "TOP", "value": 0},
+    ]
+    assert assembler.labelmap == [
+        {"type": "equ", "symbol": "VAL", "value": "5"},
+        {"type": "label", "symbol": "TOP", "value": 0},
+    ]
+    assert assembler.sym_index == {"VAL": 0, "TOP": 1}
+
+    asm = [{"line": 1, "asm": ["ld", "a", ",", "VAL"]}]
+    assembler.equ(asm)
+    assert asm[0]["asm"] == ["ld", "a", ",", "5"]
+
+
+@pytest.mark.parametrize("tokens, start, expected", [
+    (["dw", "a", ",", "b", "+", "1", ",", "c"], 1, 2),
+    (["dw", "a", ",", "b", "+", "1", ",", "c"], 3, 6),
+    (["dw", "a", ",", "b", "+", "1", ",", "c"], 7, 8),
+    (["dw", "(", "a", ",", "b", ")", ",", "c"], 1, 6),
+    (["ld", "a", ",", "(", "ix", "+", "5", ")"], 6, 7),
+    (["ld", "a", ",", ","], 3, 3),
+])
+def test_find_expression_end(tokens, start, expected):
+    """式の終端 (括弧の外側のカンマ、閉じ括弧、行末) を正しく検出すること"""
+    assert Asm()._find_expression_end(tokens, start) == expected
+
+
+def test_opcode_not_shared_with_table():
+    """アセンブル結果のオペコードが命令テーブルと共有されていないこと"""
+    a = Asm()
+    result = a.assemble_lines(["nop"])
+    assert result[0]["opcode"] == [0x00]
+    result[0]["opcode"][0] = 0xFF
+    assert Asm().assemble_lines(["nop"])[0]["opcode"] == [0x00]
+    assert Z80().asm_code_map[("nop",)].code == b"\x00"
+
+
+def test_pass1_defers_forward_reference(assembler):
+    """前方参照を含む行はpass1で仮の値のまま残り、pass2で解決されること"""
+    src_data = [
+        {"line": 1, "asm": ["org", "0x0100"]},
+        {"line": 2, "asm": ["jp", "LABEL"]},
+        {"line": 3, "asm": ["dw", "LABEL", ",", "0x1234"]},
+        {"line": 4, "asm": ["LABEL", ":"]},
+    ]
+    asm_list = assembler.pass0(src_data)
+    assembler.equ(asm_list)
+    assembler.pass1(asm_list)
+
+    assert asm_list[0]["opcode"] == [0xC3, 0x00, 0x00]
+    assert asm_list[0]["needs_pass2"] is True
+    assert asm_list[1]["opcode"] == [0x00, 0x00, 0x34, 0x12]
+    assert asm_list[1]["needs_pass2"] is True
+
+    assembler.pass2(asm_list)
+    assert asm_list[0]["opcode"] == [0xC3, 0x07, 0x01]
+    assert asm_list[1]["opcode"] == [0x07, 0x01, 0x34, 0x12]
+
+
+def test_tokenize_normalizes_keywords(assembler):
+    """予約語・疑似命令のみ小文字に正規化され、ラベルは元のまま残ること"""
+    assert assembler.tokenize("LD A,(Label)") == ["ld", "a", ",", "(", "Label", ")"]
+    assert assembler.tokenize("Data: DEFB 'X' ; c") == ["Data", ":", "defb", "'X'"]
+
+
+def test_assemble_uppercase_source():
+    """大文字で記述したソースのアセンブルテスト"""
+    assert assemble("ORG 0x100\nVAL: EQU 0x12\nTOP: LD A,VAL\nJP TOP") == bytes([0x3E, 0x12, 0xC3, 0x00, 0x01])
+
+
+@pytest.mark.parametrize("src, expected", [
+    ("push hl", b"\xe5"),
+    ("rst 0x38", b"\xff"),
+    ("im 1", b"\xed\x56"),
+    ("ldir", b"\xed\xb0"),
+])
+def test_no_expression_mnemonics(src, expected):
+    """数値オペランドを取らない命令のアセンブルテスト"""
+    assert assemble(src) == expected
+
+
+def test_equ_forward_reference():
+    """定義より前の行で使われているEQUも置換されること"""
+    assert assemble("ld a,VAL\nVAL: equ 5\nld b,VAL") == bytes([0x3E, 0x05, 0x06, 0x05])
+
+
+def test_expression_cache_not_reused_across_runs(assembler):
+    """同じインスタンスで再アセンブルした場合、前回のラベル値で式が評価されないこと"""
+    first = assembler.assemble_lines(["org 0x100", "TOP: dw TOP+1", "jp TOP+1"])
+    assert first[-1]["opcode"] == [0xC3, 0x01, 0x01]
+    second = assembler.assemble_lines(["org 0x200", "TOP: dw TOP+1", "jp TOP+1"])
+    assert second[-2]["opcode"] == [0x01, 0x02]
+    assert second[-1]["opcode"] == [0xC3, 0x01, 0x02]
+
+
+def test_assemble_cached():
+    """同じソースの再アセンブルはキャッシュ結果を返すこと"""
+    src = "org 0x100\nTOP: jp TOP"
+    assert assemble(src) is assemble(src)
+    assert assemble(src) == bytes([0xC3, 0x00, 0x01])
+
+
+def test_exec_source(assembler):
+    """ファイルを介さずに文字列のソースをアセンブルできること"""
+    result = assembler.exec_source("org 0x100\nTOP: jp TOP\n")
+    assert result[-1]["opcode"] == [0xC3, 0x00, 0x01]
+
+
+def test_pass1_errors_reported_before_resolution_errors(assembler):
+    """後方参照の行の解決エラーより、後続行のpass1のエラーが先に報告されること"""
+    src = ["T: nop"] + ["nop"] * 200 + ["jr T", "ld a, UNDEF"]
+    with pytest.raises(ValueError, match="Undefined symbol 'UNDEF'"):
+        assembler.assemble_lines(src)
+
+
+@pytest.mark.parametrize("label", ["A", "LD", "Hl"])
+def test_pass0_error_reserved_word_any_case(assembler, label):
+    """トークンリストを直接渡した場合も、大文字の予約語をラベルに使用できないこと"""
+    # 予約語は小文字に正規化されてメッセージに表示される
+    with pytest.raises(ValueError, match=f"Invalid label '{label.lower()}' in line 1: Reserved word"):
+        assembler.pass0([{"line": 1, "asm": [label, ":"]}])
+
+
+def test_pass0_uppercase_token_list(assembler):
+    """大文字のトークンリストを直接渡した場合も、ORG/EQUを認識すること"""
+    src = [
+        {"line": 1, "asm": ["ORG", "0x100"]},
+        {"line": 2, "asm": ["Y", ":", "EQU", "5"]},
+        {"line": 3, "asm": ["L1", ":", "LD", "A", ",", "Y"]},
+    ]
+    result = assembler.pass0(src)
+    assert [p["base"] for p in result] == [0x100, 0x100]
+    assert result[0]["label"] == "L1"
+    assert result[1]["asm"] == ["ld", "a", ",", "Y"]
+    assert assembler.labelmap == [
+        {"type": "equ", "symbol": "Y", "value": "5"},
+        {"type": "label+opcode", "symbol": "L1", "value": 0},
+    ]
+
+
+def test_error_message_shows_normalized_keywords(assembler):
+    """エラーメッセージ中の予約語は小文字に正規化され、ラベルは元の表記のまま表示されること"""
+    with pytest.raises(ValueError, match=r"line 1: ld \( \( FWD \) \) , hl$"):
+        assembler.assemble_lines(["LD ((FWD)), HL", "FWD: nop"])
+    with pytest.raises(ValueError, match="Invalid label 'l' in line 1: Reserved word"):
+        assembler.assemble_lines(["L: nop"])
+
+
+def test_pass2_without_pending_processes_all_lines(assembler):
+    """pass1の後に行を差し替えても、pass2は差し替えた行を解決すること"""
+    asm_list = assembler.pass0([
+        {"line": 1, "asm": ["org", "0x100"]},
+        {"line": 2, "asm": ["jp", "FWD"]},
+        {"line": 3, "asm": ["FWD", ":", "nop"]},
+    ])
+    assembler.equ(asm_list)
+    pending = assembler.pass1(asm_list)
+    assert pending == [asm_list[0]]
+
+    # 同じ行数のまま、別の辞書へ差し替える
+    asm_list[0] = dict(asm_list[0], opcode=list(asm_list[0]["opcode"]))
+    assembler.pass2(asm_list)
+    assert asm_list[0]["opcode"] == [0xC3, 0x03, 0x01]
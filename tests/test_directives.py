@@ -49,6 +49,18 @@ def test_db_invalid_string_literal_error(handler):
     with pytest.raises(ValueError, match="Invalid string literal"):
         handler.process_db_pass1(item)
 
+def test_db_non_byte_string_error(handler):
+    """DB命令（1バイトで表せない文字を含む文字列）のエラーテスト"""
+    item = {"line": 1, "asm": ["db", '"\u3042"']}
+    with pytest.raises(ValueError, match="non-byte character"):
+        handler.process_db_pass1(item)
+
+def test_db_negative_value_error(handler):
+    """DB命令（負数）のエラーテスト"""
+    item = {"line": 1, "asm": ["db", "-1"]}
+    with pytest.raises(ValueError, match="DB value out of byte range"):
+        handler.process_db_pass1(item)
+
 # --- process_dw_pass1 のテスト ---
 
 def test_dw_numeric(handler):
@@ -123,4 +135,35 @@ def test_dw_pass2_undefined_label_error(handler):
     label_map = {}
     
     with pytest.raises(ValueError, match="Undefined label or invalid expression"):
-        handler.process_dw_pass2(p, label_map)
\ No newline at end of file
+        handler.process_dw_pass2(p, label_map)
+def test_dw_label_like_python_literal(handler):
+    """DW命令（Pythonの定数名と同じ名前のラベル）はラベルとして扱われること"""
+    item = {"line": 1, "asm": ["dw", "True", ",", "None"]}
+    assert handler.process_dw_pass1(item) == [0x00, 0x00, 0x00, 0x00]
+
+def test_dw_quote_char_literals(handler):
+    """DW命令（引用符1文字の文字リテラル）のテスト"""
+    item = {"line": 1, "asm": ["dw", "'\"'", ",", "'\\''"]}
+    assert handler.process_dw_pass1(item) == [0x22, 0x00, 0x27, 0x00]
+
+def test_dw_pass1_records_fixups(handler):
+    """DW命令（Pass 1でラベル/式オペランドの位置を記録）のテスト"""
+    item = {"line": 1, "asm": ["dw", "1", ",", "L1", "+", "1", ",", ",", "L2"]}
+    item["opcode"] = handler.process_dw_pass1(item)
+    assert item["opcode"] == [0x01, 0x00, 0x00, 0x00, 0x00, 0x00]
+    assert item["fixups"] == [{"offset": 2, "location": 3}, {"offset": 4, "location": 8}]
+
+    handler.process_dw_pass2(item, {"L1": 0x1233, "L2": 0xABCD})
+    assert item["opcode"] == [0x01, 0x00, 0x34, 0x12, 0xCD, 0xAB]
+
+
+@pytest.mark.parametrize("src, message", [
+    (["dw 1)"], "Undefined label or invalid expression in DW at line 1: \\)"),
+    (["dw (1)), 2"], "Undefined label or invalid expression in DW at line 1: \\)"),
+    (["L1: nop", "L2: nop", "dw L1 L2"], "Invalid expression syntax near 'L2'"),
+    (["dw L1 L2", "L1: nop", "L2: nop"], "Invalid expression syntax near 'L2'"),
+])
+def test_dw_trailing_tokens_error(src, message):
+    """DWのオペランドに式として解釈できない余分なトークンがある場合はエラーとなること"""
+    with pytest.raises(ValueError, match=message):
+        Asm().assemble_lines(src)
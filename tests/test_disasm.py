@@ -2,14 +2,21 @@ from unittest.mock import patch
 
 import pytest
 
-from pz80.disasm import disassemble
+from pz80.disasm import Disasm, disassemble
+
+
+@pytest.fixture(scope="module")
+def shared_disassembler():
+    """モジュール内で共有する逆アセンブラのインスタンス
+       (状態を変更するテストは conftest の disassembler を使うこと)"""
+    return Disasm()
 
 
 @pytest.fixture
-def disasm_exec(disassembler):
+def disasm_exec(shared_disassembler):
     """逆アセンブル実行を簡略化するヘルパーフィクスチャ"""
     def _exec(binary, start_addr=0x0000):
-        return disassembler.exec(start_addr, binary, len(binary))
+        return shared_disassembler.exec(start_addr, binary, len(binary))
     return _exec
 
 def test_disasm_nop(disasm_exec):
@@ -54,7 +61,7 @@ def test_disasm_invalid_opcode(disasm_exec):
     assert result[2]["opcode"] == [0xFF]
     assert "rst 0x38" in result[2]["asm"].lower()
 
-def test_disasm_handle_3bytes_error_path(disassembler, disasm_exec):
+def test_disasm_handle_3bytes_error_path(disassembler):
     """_handle_3bytesがNoneを返すケースのテスト"""
     # 3バイト長だが、typeもjmpも指定されていない定義を注入
     broken_key = (0x00, 0x00, 0x00)
@@ -69,7 +76,7 @@ def test_disasm_handle_3bytes_error_path(disassembler, disasm_exec):
     with patch.dict(disassembler.cpu._op_map, {broken_key: broken_value}):
         # op2asmは定義を見つけるが、_handle_3bytesはNoneを返す
         # execは3バイトでのマッチに失敗し、1バイト(nop)として処理するはず
-        result = disasm_exec(binary)
+        result = disassembler.exec(0x0000, binary, len(binary))
         
         # 最初の命令がnop (00) であること
         assert result[1]["opcode"] == [0x00]
@@ -153,4 +160,29 @@ def test_disassemble_function_label_resolution():
     # ラベル定義 "L_1000:" が含まれているか
     assert any("l_1000:" in line.lower() for line in lines)
     # 命令でラベルが使用されているか "jr l_1000"
-    assert any("jr l_1000" in line.lower() for line in lines)
\ No newline at end of file
+    assert any("jr l_1000" in line.lower() for line in lines)
+
+def test_disasm_datamap_one_byte_per_line(disassembler):
+    """データ範囲は1バイトずつ db として出力されること"""
+    disassembler.datamap = [[0x0000, 0x0001]]
+    result = disassembler.exec(0x0000, [0x41, 0x42, 0x00], 3)
+
+    assert [p["opcode"] for p in result[1:]] == [[0x41], [0x42], [0x00]]
+    assert result[1]["asm"] == "db 0x41 ; [A]"
+    assert result[2]["asm"] == "db 0x42 ; [B]"
+    assert "nop" in result[3]["asm"].lower()
+
+
+def test_exec_text_matches_exec(shared_disassembler):
+    """exec_text は exec と同じ内容をテキスト行として返すこと"""
+    binary = [0x00, 0x18, 0xFD, 0x3E, 0x10]
+    records = shared_disassembler.exec(0x1000, binary, len(binary))
+    lines = shared_disassembler.exec_text(0x1000, binary, len(binary))
+
+    expected = []
+    for p in records:
+        if "label" in p:
+            expected.append(p["label"])
+        expected.append(f"    {p['asm']}" if p.get("opcode") else p["asm"])
+    assert lines == expected
+    assert "L_1000:" in lines
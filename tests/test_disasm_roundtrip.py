@@ -1,57 +1,44 @@
-import os
-import tempfile
 import unittest
 
 from pz80 import asm, disasm
 
 
 class TestDisasm(unittest.TestCase):
-    def setUp(self):
-        self.asm = asm.Asm()
-        self.disasm = disasm.Disasm()
+    @classmethod
+    def setUpClass(cls):
+        # 各テストでの再構築を避けるため、アセンブラ/逆アセンブラはクラス内で共有する
+        # (どちらも exec() の実行ごとに状態をリセットする)
+        cls.asm = asm.Asm()
+        cls.disasm = disasm.Disasm()
 
     def _assemble_and_disassemble(self, source, start_addr=0):
         """
         ソースコードをアセンブルし、その結果を逆アセンブルして結果のリストを返すヘルパー
         """
         # 1. アセンブル実行
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, encoding='utf-8', suffix='.asm') as tmp:
-            tmp.write(source)
-            tmp_path = tmp.name
-        
-        try:
-            asm_result = self.asm.exec(tmp_path)
-        finally:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-
-        # 2. バイナリイメージ(メモリ)の構築
-        # disasm.exec は 64KB のリストを要求するため
-        memory = [0] * 0x10000
-        max_addr = 0
-        
-        # アセンブル結果からメモリに配置
-        for line in asm_result:
-            if "opcode" in line and line["opcode"]:
-                addr = line["base"] + line["offset"]
-                code = line["opcode"]
-                for i, byte in enumerate(code):
-                    if addr + i < 0x10000:
-                        memory[addr + i] = byte
-                
-                current_end = addr + len(code)
-                if current_end > max_addr:
-                    max_addr = current_end
+        asm_result = self.asm.exec_source(source)
 
+        # 2. バイナリイメージの構築
+        # 64KB全体ではなく、start_addr から最終アドレスまでの範囲のみを確保する
+        # (ORG未指定時のベースアドレス -1 は 0 とみなす)
+        emit = [
+            (max(0, line["base"]) + line["offset"], line["opcode"])
+            for line in asm_result
+            if line.get("opcode")
+        ]
+        max_addr = max((addr + len(code) for addr, code in emit), default=0)
         if max_addr == 0:
             return []
 
-        size = max_addr - start_addr
-        
+        size = max(0, max_addr - start_addr)
+        binary_chunk = bytearray(size)
+        for addr, code in emit:
+            offset = addr - start_addr
+            if offset >= 0:
+                binary_chunk[offset : offset + len(code)] = bytes(code)
+
         # 3. 逆アセンブル実行
-        # disasm.exec は images[0] を start_addr に配置するため、
-        # memory全体ではなく、start_addr からのデータを切り出して渡す必要がある
-        binary_chunk = memory[start_addr : start_addr + size]
+        # disasm.exec は images[0] を start_addr に配置する
         disasm_result = self.disasm.exec(start_addr, binary_chunk, size)
         
         return disasm_result
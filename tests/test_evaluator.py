@@ -1,6 +1,6 @@
 import pytest
 
-from pz80.evaluator import ExpressionEvaluator
+from pz80.evaluator import ExpressionEvaluator, compile_expression, decode_string_literal
 from pz80.z80 import Z80
 
 
@@ -137,3 +137,54 @@ def test_error_reserved_word(cpu):
 def test_error_long_char_literal(cpu):
     with pytest.raises(ValueError, match="String literal in expression must be 1 or 2 characters"):
         evaluate_expression(["'ABC'"], cpu)
+
+
+# String literal decoding
+@pytest.mark.parametrize("token", [
+    "'A'", '""', r"'a\nb'", r'"He said \"Hi\""', r"'\x41\\'", r"'\0'", r"'\01'", r"'あ'", r"'\\n'",
+])
+def test_decode_string_literal(token):
+    import ast
+    assert decode_string_literal(token) == ast.literal_eval(token)
+
+
+@pytest.mark.parametrize("token", ["'abc", "'a'b'", "x", "'"])
+def test_decode_string_literal_invalid(token):
+    with pytest.raises((ValueError, SyntaxError)):
+        decode_string_literal(token)
+
+
+def test_escaped_char_literal(cpu):
+    assert evaluate_expression([r"'\n'"], cpu) == 0x0A
+
+
+# Compiled (RPN) evaluation
+def test_compile_expression_constant_folding():
+    rpn = compile_expression(("(", "1", "+", "2", ")", "*", "3"))
+    assert len(rpn) == 1
+    assert ExpressionEvaluator([], None, 1, None).run(rpn) == 9
+
+
+def test_compile_expression_with_labels(cpu):
+    rpn = compile_expression(("L1", "+", "L2", "*", "2"))
+    evaluator = ExpressionEvaluator([], {"L1": 0x100, "L2": 3}, 1, cpu)
+    assert evaluator.run(rpn) == 0x106
+
+
+def test_compile_expression_invalid_returns_none():
+    assert compile_expression(("(", "10", "+", "5")) is None
+    assert compile_expression(()) is None
+
+
+def test_compile_expression_division_by_zero_at_run(cpu):
+    rpn = compile_expression(("10", "/", "0"))
+    with pytest.raises(ValueError, match="Division by zero"):
+        ExpressionEvaluator([], None, 1, cpu).run(rpn)
+
+
+def test_evaluate_reuses_compiled_expression(cpu):
+    tokens = ["(", "10", "+", "2", ")", "*", "3"]
+    assert evaluate_expression(tokens, cpu) == 36
+    hits = compile_expression.cache_info().hits
+    assert evaluate_expression(tokens, cpu, line_num=2) == 36
+    assert compile_expression.cache_info().hits == hits + 1
@@ -1,11 +1,12 @@
 import io
 import os
+import sys
 import tempfile
 import unittest
 from argparse import Namespace
 from unittest.mock import patch
 
-from pz80.__main__ import command_asm, command_disasm
+from pz80.__main__ import _load_config, _load_config_file, command_asm, command_disasm, main
 
 
 class TestCommandAsm(unittest.TestCase):
@@ -183,5 +184,205 @@ class TestCommandDisasm(unittest.TestCase):
         self.assertIn("db 0x00", output)
         self.assertNotIn("nop", output.lower())
 
+    def test_output_nodump(self):
+        """ダンプなし出力 (-n) のテスト"""
+        # 0x0000: ld a, 0x10 / 0x0002: nop
+        self._write_bin(b'\x3E\x10\x00')
+
+        args = Namespace(
+            input=[self.bin_path],
+            config=None,
+            start=0,
+            nodump=True,
+            output=None
+        )
+
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            command_disasm(args)
+
+        expected = "org 0x0000\n    LD a, 0x10\n    NOP\n"
+        self.assertEqual(captured_output.getvalue(), expected)
+
+    def test_output_dump(self):
+        """ダンプ付き出力のフォーマットテスト"""
+        # 0x0000: jr 0x0000 (自分自身へのジャンプ)
+        self._write_bin(b'\x18\xFE')
+
+        args = Namespace(
+            input=[self.bin_path],
+            config=None,
+            start=0,
+            nodump=False,
+            output=None
+        )
+
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            command_disasm(args)
+
+        lines = captured_output.getvalue().splitlines()
+        self.assertEqual(lines[0], "0x0000" + " " * 14 + " " * 7 + "org 0x0000")
+        self.assertEqual(lines[1], "0x0000 18 FE        L_0000: JR L_0000")
+
+    def test_config_cache(self):
+        """同一設定ファイルの再読み込みがキャッシュされ、更新時には再読み込みされるテスト"""
+        self._write_cfg("data = [[0x0000, 0x0000]]")
+        first = _load_config(self.cfg_path)
+        self.assertIs(_load_config(self.cfg_path), first)
+
+        # ファイル更新 (更新時刻を進める) で再読み込みされること
+        self._write_cfg("data = [[0x0010, 0x0020]]")
+        st = os.stat(self.cfg_path)
+        os.utime(self.cfg_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        data, _, _ = _load_config(self.cfg_path)
+        self.assertEqual(data, [[0x0010, 0x0020]])
+
+    def test_config_data_not_shared(self):
+        """逆アセンブラに渡したデータマップの変更が、キャッシュされた設定に及ばないテスト"""
+        self._write_bin(b'\x00')
+        self._write_cfg("data = [[0x0000, 0x0000]]")
+        args = Namespace(input=[self.bin_path], config=self.cfg_path, start=0, nodump=True, output=None)
+
+        def exec_and_modify(ope, start, images, size):
+            ope.datamap.append([0x0010, 0x0010])
+            ope.datamap[0][1] = 0x0001
+            return []
+
+        with patch('pz80.disasm.Disasm.exec', autospec=True, side_effect=exec_and_modify):
+            command_disasm(args)
+
+        data, _, _ = _load_config(self.cfg_path)
+        self.assertEqual(data, [[0x0000, 0x0000]])
+
+    def test_config_module_reused(self):
+        """設定ファイルは実パスごとに1つのモジュールとして登録され、未更新なら再実行されないテスト"""
+        self._write_cfg("data = [[0x0000, 0x0000]]")
+        _load_config(self.cfg_path)
+        keys = {k for k in sys.modules if k.startswith("pz80_cfg_")}
+        module = {k: sys.modules[k] for k in keys}
+
+        # キャッシュから外れても、登録済みのモジュールをそのまま使うこと
+        _load_config_file.cache_clear()
+        _load_config(self.cfg_path)
+        self.assertEqual({k: sys.modules[k] for k in sys.modules if k.startswith("pz80_cfg_")}, module)
+
+        # 更新後は同じモジュール名で置き換えられること
+        self._write_cfg("data = [[0x0010, 0x0020]]")
+        st = os.stat(self.cfg_path)
+        os.utime(self.cfg_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        data, _, _ = _load_config(self.cfg_path)
+        self.assertEqual(data, [[0x0010, 0x0020]])
+        self.assertEqual({k for k in sys.modules if k.startswith("pz80_cfg_")}, keys)
+
+    def test_output_file(self):
+        """出力ファイル指定 (-o) のテスト"""
+        self._write_bin(b'\x00')
+        out_fd, out_path = tempfile.mkstemp(suffix='.asm')
+        os.close(out_fd)
+
+        args = Namespace(
+            input=[self.bin_path],
+            config=None,
+            start=0,
+            nodump=True,
+            output=out_path
+        )
+
+        try:
+            command_disasm(args)
+            with open(out_path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), "org 0x0000\n    NOP\n")
+        finally:
+            os.remove(out_path)
+
+    def test_config_invalid_data_range(self):
+        """設定ファイルの不正なデータ範囲 (開始 > 終了) のエラーテスト"""
+        self._write_cfg("data = [[0x0000, 0x0001], [0x0010, 0x0008]]")
+        self._write_bin(b'\x00')
+
+        args = Namespace(
+            input=[self.bin_path],
+            config=self.cfg_path,
+            start=0,
+            nodump=False,
+            output=None
+        )
+
+        captured_error = io.StringIO()
+        with patch('sys.stderr', captured_error), self.assertRaises(SystemExit):
+            command_disasm(args)
+
+        self.assertIn("Invalid data range #1", captured_error.getvalue())
+
+    def test_input_file_not_found(self):
+        """存在しない入力ファイルが全て報告されるテスト"""
+        self._write_bin(b'\x00')
+        missing1 = self.bin_path + '.missing1'
+        missing2 = self.bin_path + '.missing2'
+
+        args = Namespace(
+            input=[missing1, self.bin_path, missing2],
+            config=None,
+            start=0,
+            nodump=False,
+            output=None
+        )
+
+        captured_error = io.StringIO()
+        with patch('sys.stderr', captured_error), self.assertRaises(SystemExit):
+            command_disasm(args)
+
+        error = captured_error.getvalue()
+        self.assertIn(f"Input file not found: {missing1}", error)
+        self.assertIn(f"Input file not found: {missing2}", error)
+
+
+class TestMain(unittest.TestCase):
+    """main関数 (サブコマンドの振り分け) のテストクラス"""
+
+    def _run_main(self, argv):
+        with patch('sys.argv', ['pz80'] + argv), \
+             patch('pz80.__main__.command_asm') as asm_handler, \
+             patch('pz80.__main__.command_disasm') as disasm_handler:
+            main()
+        return asm_handler, disasm_handler
+
+    def test_dispatch_asm(self):
+        """asm サブコマンドが command_asm に振り分けられること"""
+        asm_handler, disasm_handler = self._run_main(['asm', '-f', 'a.asm', '-o', 'a.bin'])
+        asm_handler.assert_called_once()
+        disasm_handler.assert_not_called()
+        self.assertEqual(asm_handler.call_args[0][0].file, 'a.asm')
+
+    def test_dispatch_disasm(self):
+        """disasm サブコマンドが command_disasm に振り分けられること"""
+        asm_handler, disasm_handler = self._run_main(['disasm', '-i', 'a.bin', '-n'])
+        disasm_handler.assert_called_once()
+        asm_handler.assert_not_called()
+        self.assertEqual(disasm_handler.call_args[0][0].input, ['a.bin'])
+
+    def test_help_lists_all_subcommands(self):
+        """ヘルプ表示では全てのサブコマンドが選択肢に含まれること"""
+        captured = io.StringIO()
+        with patch('sys.argv', ['pz80', '-h']), patch('sys.stdout', captured), \
+             self.assertRaises(SystemExit):
+            main()
+        self.assertIn('{disasm,asm}', captured.getvalue())
+
+        # サブコマンドのヘルプは、そのサブコマンドのオプションを表示する
+        captured = io.StringIO()
+        with patch('sys.argv', ['pz80', 'asm', '-h']), patch('sys.stdout', captured), \
+             self.assertRaises(SystemExit):
+            main()
+        self.assertIn('usage: pz80 asm', captured.getvalue())
+        self.assertIn('--file', captured.getvalue())
+
+        captured = io.StringIO()
+        with patch('sys.argv', ['pz80', 'unknown']), patch('sys.stderr', captured), \
+             self.assertRaises(SystemExit):
+            main()
+        self.assertIn("choose from 'disasm', 'asm'", captured.getvalue())
+
 if __name__ == '__main__':
     unittest.main()